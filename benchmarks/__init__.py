@@ -0,0 +1,8 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Benchmarks of the simulator's performance, run with
+"python -m benchmarks".
+'''
@@ -0,0 +1,112 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Runs the simulator benchmarks and compares them to a baseline.
+'''
+
+import sys, json, argparse, itertools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from helper.config import SimConfig
+from benchmarks.suite import run_config
+
+
+# Results where lower values are better.
+LOWER_IS_BETTER = {'peak_bytes', 'is_ancestor_seconds', 'update_justified_head_seconds'}
+
+
+def run_benchmarks(configs, repeats):
+    '''
+    Function runs each configuration in a fresh process,
+    so memory does not carry over.
+    '''
+
+    context = multiprocessing.get_context('spawn')
+
+    records = []
+    for config in configs:
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results = executor.submit(run_config, config, repeats).result()
+
+        print(config, results)
+        records.append({'config': config, 'results': results})
+
+    return records
+
+
+def compare(records, baseline, tolerance):
+    '''
+    Function returns results worse than the baseline
+    by more than the tolerance.
+    '''
+
+    baseline_results = {json.dumps(r['config'], sort_keys=True): r['results'] for r in baseline}
+
+    regressions = []
+    for record in records:
+
+        base = baseline_results.get(json.dumps(record['config'], sort_keys=True))
+        if base is None:
+            continue
+
+        for name, value in record['results'].items():
+
+            if name not in base or not base[name]:
+                continue
+
+            ratio = value / base[name]
+            if name not in LOWER_IS_BETTER:
+                ratio = 1 / ratio if ratio else float('inf')
+
+            if ratio > 1 + tolerance:
+                regressions.append((record['config'], name, base[name], value))
+
+    return regressions
+
+
+def main():
+
+    defaults = SimConfig()
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark the Casper simulator.")
+    parser.add_argument('--validators', type=int, nargs='+', default=[defaults.validators])
+    parser.add_argument('--latencies', type=float, nargs='+', default=[defaults.avg_latency])
+    parser.add_argument('--checkpoints', type=int, nargs='+', default=[defaults.checkpoints])
+    parser.add_argument('--chain-lengths', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Chain lengths in checkpoints for ancestry benchmarks.")
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--repeats', type=int, default=5,
+                        help="Times each benchmark is repeated, keeping the median or fastest.")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Fraction a result may be worse than the baseline.")
+    args = parser.parse_args()
+
+    configs = [{'validators': v, 'latency': l, 'checkpoints': c, 'seed': args.seed}
+               for v, l, c in itertools.product(args.validators, args.latencies, args.checkpoints)]
+
+    configs += [{'chain_length': n} for n in args.chain_lengths]
+
+    records = run_benchmarks(configs, args.repeats)
+
+    with open(args.output, 'w') as f:
+        json.dump(records, f, indent=2)
+
+    if args.baseline:
+
+        with open(args.baseline) as f:
+            regressions = compare(records, json.load(f), args.tolerance)
+
+        for config, name, base, value in regressions:
+            print(f"Regression in {name} for {config}: {base} -> {value}")
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
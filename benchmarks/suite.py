@@ -0,0 +1,156 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Benchmarks of the simulator, each run in a fresh process
+so memory does not carry over between configurations.
+'''
+
+import time, timeit, statistics, tracemalloc
+from helper.config import SimConfig
+from casper.block import Block, GENESIS
+from casper.network import Network
+from casper.caspervalidator import CasperValidator
+
+
+def create_network(config):
+    network = Network(config.avg_latency, config.seed, config)
+    nodes = [CasperValidator(network, i) for i in config.validator_set]
+
+    return network, nodes
+
+
+def bench_execute(config):
+    '''
+    Function measures logical time units simulated per second,
+    ticking every unit and event driven.
+    '''
+
+    results = {}
+
+    network, _ = create_network(config)
+    start = time.perf_counter()
+    for _ in range(config.end_time):
+        network.execute()
+    elapsed = time.perf_counter() - start
+    results['tick_ticks_per_second'] = config.end_time / elapsed
+
+    network, _ = create_network(config)
+    start = time.perf_counter()
+    network.run(config.end_time)
+    elapsed = time.perf_counter() - start
+    results['event_ticks_per_second'] = config.end_time / elapsed
+
+    return results
+
+
+def bench_deliver(config):
+    '''
+    Function measures messages delivered to validators per
+    second of time spent in CasperValidator.deliver.
+    '''
+
+    network, nodes = create_network(config)
+
+    stats = {'count': 0, 'time': 0.0, 'depth': 0}
+
+    def timed(deliver):
+        def wrapper(message):
+
+            # Time only outermost deliveries.
+            stats['depth'] += 1
+            start = time.perf_counter()
+            try:
+                return deliver(message)
+            finally:
+                stats['depth'] -= 1
+                if not stats['depth']:
+                    stats['time'] += time.perf_counter() - start
+                    stats['count'] += 1
+        return wrapper
+
+    for node in nodes:
+        node.deliver = timed(node.deliver)
+
+    network.run(config.end_time)
+
+    return {'messages': stats['count'],
+            'messages_per_second': stats['count'] / stats['time']}
+
+
+def bench_memory(config):
+    '''
+    Function measures peak memory allocated during a run.
+    '''
+
+    tracemalloc.start()
+
+    network, _ = create_network(config)
+    network.run(config.end_time)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'peak_bytes': peak}
+
+
+def best_time(function, calls, repeats):
+    '''
+    Function returns the fastest of repeated timings
+    of a function, in seconds per call.
+    '''
+    return min(timeit.repeat(function, number=calls, repeat=repeats)) / calls
+
+
+def bench_ancestry(chain_length, repeats=5, calls=10000, scans=10):
+    '''
+    Function measures is_ancestor calls on a chain of chain_length
+    checkpoints, and update_justified_head rescanning the chain
+    when a checkpoint forking from genesis is justified.
+    '''
+
+    config = SimConfig(validators=1, avg_latency=0, seed=0)
+
+    network, nodes = create_network(config)
+    node = nodes[0]
+
+    def build(block, length):
+        # Build chain directly at the validator.
+        for _ in range(length * config.checkpoint_diff):
+            block = Block(block, network.rng, config.checkpoint_diff)
+            network.record_block(block)
+            node.deliver(block)
+        return block
+
+    block = build(GENESIS, chain_length)
+    fork = build(GENESIS, 1)
+
+    ancestor_time = best_time(lambda: node.is_ancestor(GENESIS, block), calls, repeats)
+
+    # Every checkpoint of the chain is above the fork, so is scanned.
+    node.highest_justified_checkpoint = fork
+    rescan_time = best_time(node.update_justified_head, scans, repeats)
+
+    return {'is_ancestor_seconds': ancestor_time, 'update_justified_head_seconds': rescan_time}
+
+
+def run_config(config, repeats=5):
+    '''
+    Function runs the benchmarks of one configuration, taking
+    the median of repeated simulation benchmarks.
+    '''
+
+    if 'chain_length' in config:
+        return bench_ancestry(config['chain_length'], repeats)
+
+    sim_config = SimConfig(validators=config['validators'], avg_latency=config['latency'],
+                           checkpoints=config['checkpoints'], seed=config['seed'])
+
+    runs = [{**bench_execute(sim_config), **bench_deliver(sim_config)} for _ in range(repeats)]
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+    # Allocations do not vary between runs.
+    results.update(bench_memory(sim_config))
+
+    return results
@@ -4,8 +4,9 @@ Marco Marasco 834482
 Austen McClernon 834063
 '''
 
+import random
 from  helper.hash_gen import generate_hash
-from helper.parameters import *
+from helper.parameters import CHECKPOINT_DIFF
 
 class Block():
 
@@ -13,7 +14,9 @@ class Block():
     Block class for blockchain.
     '''
 
-    def __init__(self, parent=None):
+    __slots__ = ('height', 'parent_hash', 'hash', 'is_checkpoint', 'checkpoint_height')
+
+    def __init__(self, parent=None, rng=random, checkpoint_diff=CHECKPOINT_DIFF):
 
         # Genesis block
         if not parent:
@@ -26,10 +29,12 @@ class Block():
             self.height = parent.height + 1
             self.parent_hash = parent.hash
 
-        self.validators = list(range(VALIDATORS))
-
-        self.hash = generate_hash()
+        self.hash = generate_hash(rng)
         
-        self.is_checkpoint = self.height % CHECKPOINT_DIFF == 0
+        self.is_checkpoint = self.height % checkpoint_diff == 0
         
-        self.checkpoint_height = self.height // CHECKPOINT_DIFF
+        self.checkpoint_height = self.height // checkpoint_diff
+
+
+# Create root, with the same hash in every run.
+GENESIS = Block(rng=random.Random('genesis'))
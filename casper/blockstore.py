@@ -0,0 +1,128 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+from array import array
+
+
+class BlockStore():
+    '''
+    Class stores the block tree shared by all validators
+    in a network, one row per block. Checkpoint links are
+    computed once when a block is added.
+    '''
+
+    def __init__(self, genesis):
+
+        # Row of each block hash.
+        self.index = {}
+
+        self.blocks = []
+
+        self.hashes = array('Q')
+        self.heights = array('q')
+
+        # Row of parent block, -1 for genesis.
+        self.parents = array('q')
+
+        # Row of closest checkpoint, the block itself if a checkpoint.
+        self.tails = array('q')
+
+        # Logical time block was proposed.
+        self.times = array('q')
+
+        # Jump pointers over the checkpoint tree, the k-th entry
+        # of a checkpoint's row is its 2^k-th checkpoint ancestor.
+        self.jumps = {}
+
+        self.add(genesis, 0)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, _hash):
+        return _hash in self.index
+
+    def add(self, block, time):
+        '''
+        Function appends a block to the store
+        and returns its row.
+        '''
+
+        row = len(self.blocks)
+        parent = self.index.get(block.parent_hash, -1) if block.height > 0 else -1
+
+        self.index[block.hash] = row
+        self.blocks.append(block)
+
+        self.hashes.append(block.hash)
+        self.heights.append(block.height)
+        self.parents.append(parent)
+        self.times.append(time)
+
+        if block.is_checkpoint:
+
+            self.tails.append(row)
+
+            # Index checkpoint ancestry.
+            jumps = [self.tails[parent]] if parent >= 0 else []
+
+            # Extend jumps while the ancestor has a jump of the same length.
+            while jumps and len(self.jumps[jumps[-1]]) >= len(jumps):
+                jumps.append(self.jumps[jumps[-1]][len(jumps) - 1])
+
+            self.jumps[row] = jumps
+
+        else:
+            self.tails.append(self.tails[parent])
+
+        return row
+
+    def get(self, _hash):
+        return self.blocks[self.index[_hash]]
+
+    def get_tail(self, block):
+        '''
+        Function returns closest checkpoint of a block,
+        the block itself if it is a checkpoint.
+        '''
+        return self.blocks[self.tails[self.index[block.hash]]]
+
+    def get_checkpoint_parent(self, block):
+
+        # Genesis
+        if block.height == 0:
+            return None
+
+        return self.blocks[self.tails[self.parents[self.index[block.hash]]]]
+
+    def is_ancestor(self, ancestor, descendant):
+
+        if descendant.hash == ancestor.hash:
+            return True
+
+        # Only checkpoints are ancestors of other blocks.
+        if not ancestor.is_checkpoint:
+            return False
+
+        # Start from closest checkpoint of descendant.
+        row = self.tails[self.index[descendant.hash]]
+
+        # Checkpoints are spaced evenly, so the depth in the
+        # checkpoint tree is the checkpoint height.
+        distance = self.blocks[row].checkpoint_height - ancestor.checkpoint_height
+
+        if distance < 0:
+            return False
+
+        # Jump up to the ancestor's height.
+        k = 0
+        while distance:
+            if distance & 1:
+                row = self.jumps[row][k]
+            distance >>= 1
+            k += 1
+
+        return self.hashes[row] == ancestor.hash
@@ -5,11 +5,12 @@ Austen McClernon 834063
 '''
 
 from casper.block import Block
-from casper.network import VoteMessage
-from helper.parameters import *
+from casper.network import VoteMessage, AggregateVote
 from casper.node import GENESIS, Node
+from casper.slashing import SlashingRecord
+from casper.tally import LinkTally
 from helper.hash_gen import generate_hash
-import math, random
+import math, bisect
 
 class CasperValidator(Node):
     '''
@@ -23,12 +24,17 @@ class CasperValidator(Node):
 
         self.head = GENESIS
 
-        self.deposit = INITIAL_DEPOSIT
+        self.deposit = self.config.initial_deposit
 
         self.highest_justified_checkpoint = GENESIS
 
         self.main_chain_size = 1
 
+        # Checkpoints ordered by descending height, then arrival.
+        self.checkpoint_order = [(-GENESIS.height, 0, GENESIS.hash)]
+
+        # Highest checkpoint descending from the highest justified checkpoint.
+        self.justified_head = GENESIS
 
         # Justified checkpoints.
         self.justified_checkpoints = {GENESIS.hash}
@@ -39,17 +45,21 @@ class CasperValidator(Node):
         # Votes from all validators in network.
         self.validator_votes = {}
 
-        # Record of votes for blocks.
-        self.block_vote_count = {}
+        # Record of votes for links between checkpoints.
+        self.link_tally = LinkTally()
+
+        # Votes collected as an aggregator by link, with
+        # the time to send them and a vote for the link.
+        self.aggregates = {}
 
 
     # Check if block is justified.
     def is_justified(self, _hash):
-        return (_hash in self.justified_checkpoints) and (_hash in self.received) and (self.received[_hash].is_checkpoint)
+        return (_hash in self.justified_checkpoints) and self.has_block(_hash) and (self.get_block(_hash).is_checkpoint)
 
     # Check if block is finalised.
     def is_finalised(self, _hash):
-        return (_hash in self.finalised_checkpoints) and (_hash in self.received) and (self.received[_hash].is_checkpoint)
+        return (_hash in self.finalised_checkpoints) and self.has_block(_hash) and (self.get_block(_hash).is_checkpoint)
 
 
     def accept_block(self, block):
@@ -59,38 +69,29 @@ class CasperValidator(Node):
         '''
 
         # Haven't recieved block's parent.
-        if block.parent_hash not in self.received:
+        if not self.has_block(block.parent_hash):
             self.add_message_buffer(block.parent_hash, block)
             return False
 
         
-        self.received[block.hash] = block
+        self.mark_received(block)
+
+        # Block does not extend the current head.
+        if block.parent_hash != self.head.hash:
+            self.network.emit('fork', self.id, height=block.height)
 
         if block.is_checkpoint:
 
-            #  Start a tail object for it
-            self.path_membership[block.hash] = block.hash
-            self.paths[block.hash] = block
+            self.track_checkpoint(block)
+
+            self.network.emit('checkpoint', self.id, height=block.height, hash=block.hash,
+                              parent=self.get_checkpoint_parent(block).hash)
 
             # Create vote
             self.create_vote(block)
-
-        else:
-
-            # Assert in tail
-            assert block.parent_hash in self.path_membership
-
-            # Update block's tail to match its parent.
-            self.path_membership[block.hash] = self.path_membership[block.parent_hash]
-
-            curr_tail = self.path_membership[block.hash]
-
-            # Adjust end of tail.
-            if block.height > self.paths[curr_tail].height:
-                self.paths[curr_tail] = block
         
         # Assert in correct tree.
-        if self.is_ancestor(self.highest_justified_checkpoint, self.path_membership[block.hash]):
+        if self.is_ancestor(self.highest_justified_checkpoint, self.network.block_store.get_tail(block)):
             
             # Update current working head.
             self.head = block
@@ -103,28 +104,42 @@ class CasperValidator(Node):
 
         return True
  
-    def fix_head(self, block):
+    def track_checkpoint(self, block):
         '''
-        Adjust current working chain head to highest checkpointed block.
+        Add a received checkpoint to the fork choice.
         '''
 
-        max_height = self.highest_justified_checkpoint.height
-        max_descendant = self.highest_justified_checkpoint.hash
-  
-        descendants = list(self.paths.keys()).copy()        
+        bisect.insort(self.checkpoint_order, (-block.height, len(self.checkpoint_order), block.hash))
 
-        descendants = list(filter(lambda a: self.is_ancestor(
-            self.highest_justified_checkpoint, a), descendants))
+        # New highest checkpoint in the justified subtree.
+        if (block.height > self.justified_head.height and
+                self.is_ancestor(self.highest_justified_checkpoint, block)):
+            self.justified_head = block
 
-        # Sort tails by ascending height.
-        descendants.sort(key=lambda a: -self.received[a].height)
+    def update_justified_head(self):
+        '''
+        Find the highest checkpoint descending from a new
+        highest justified checkpoint.
+        '''
 
-        highest_desc = max(descendants, key = lambda a: self.received[a].height)
+        # Scan from the highest checkpoint, the justified checkpoint
+        # itself ends the scan at the latest.
+        for _, _, _hash in self.checkpoint_order:
+            if self.is_ancestor(self.highest_justified_checkpoint, _hash):
+                self.justified_head = self.get_block(_hash)
+                return
+
+    def fix_head(self, block):
+        '''
+        Adjust current working chain head to highest checkpointed block.
+        '''
+
+        max_height = self.highest_justified_checkpoint.height
 
         # Update current height to highest.
-        if self.received[highest_desc].height > max_height:
-            self.main_chain_size = self.received[highest_desc].height
-            self.head = self.received[highest_desc]
+        if self.justified_head.height > max_height:
+            self.main_chain_size = self.justified_head.height
+            self.head = self.justified_head
 
 
     def create_vote(self, block):
@@ -145,6 +160,10 @@ class CasperValidator(Node):
             # Adjust current working height.
             self.current_height = target_block.checkpoint_height
 
+            # Only the epoch's committee votes.
+            if not self.network.in_committee(self.id, target_block.checkpoint_height):
+                return
+
             if self.is_ancestor(source_block, target_block):
                 
 
@@ -153,20 +172,26 @@ class CasperValidator(Node):
                     n = len(self.proposed_votes)
 
                     # Submit random previous vote to violate slashing condition 1.
-                    vote = self.proposed_votes[random.randint(0, n-1)]
+                    vote = self.proposed_votes[self.network.rng.randint(0, n-1)]
 
                     # Update hash so doesn't appear as duplicate message.
-                    vote.hash = generate_hash()
+                    vote.hash = generate_hash(self.network.rng)
                                 
                 else:
                     vote = VoteMessage(source_block.hash,
                                 target_block.hash,
                                 source_block.checkpoint_height,
                                 target_block.checkpoint_height,
-                                self.id, self.deposit)
+                                self.id, self.deposit, self.network.rng)
 
                 self.proposed_votes.append(vote)
-                self.network.broadcast(vote, self.id)
+
+                # Send only to aggregators if votes are aggregated.
+                if self.config.aggregators:
+                    self.network.broadcast(vote, self.id, self.network.aggregators(vote.target_height))
+                else:
+                    self.network.broadcast(vote, self.id)
+
                 self.deliver(vote)
                 
 
@@ -176,20 +201,7 @@ class CasperValidator(Node):
         Function determines if a validators has violated the 
         Casper slashing conditions.
         '''
-        for past_vote in self.validator_votes[new_vote.validator]:
-
-            # Slashing condition 1.
-            if past_vote.target_height == new_vote.target_height:
-                return False
-
-            # Slashing condition 2.
-            if ((past_vote.source_height < new_vote.source_height and
-                 past_vote.target_height > new_vote.target_height) or
-               (past_vote.source_height > new_vote.source_height and
-                 past_vote.target_height < new_vote.target_height)):
-                return False
-
-        return True
+        return not self.validator_votes[new_vote.validator].violates(new_vote)
 
     def check_vote(self, vote):
         '''
@@ -199,8 +211,12 @@ class CasperValidator(Node):
         '''
 
 
+        # Only votes of the target epoch's committee count.
+        if not self.network.in_committee(vote.validator, vote.target_height):
+            return False
+
        # Haven't received source block yet.
-        if vote.source not in self.received:
+        if not self.has_block(vote.source):
             self.add_message_buffer(vote.source, vote)
 
         # Assert source is justified.
@@ -208,7 +224,7 @@ class CasperValidator(Node):
             return False
 
         # Haven't received target block.
-        if vote.target not in self.received:
+        if not self.has_block(vote.target):
             self.add_message_buffer(vote.target, vote)
             return False
 
@@ -218,7 +234,7 @@ class CasperValidator(Node):
 
         # Create new record for validator if unseen.
         if vote.validator not in self.validator_votes:
-            self.validator_votes[vote.validator] = []
+            self.validator_votes[vote.validator] = SlashingRecord()
 
         # Check the slashing conditions,
         if not self.slashing_conditions(vote):
@@ -226,36 +242,155 @@ class CasperValidator(Node):
             return False
 
         # Valid vote, add to record for validator.
-        self.validator_votes[vote.validator].append(vote)
-
-        # Create block vote record.
-        if vote.source not in self.block_vote_count:
-            self.block_vote_count[vote.source] = {}
+        self.validator_votes[vote.validator].add(vote)
 
         # Update votes
-        self.block_vote_count[vote.source][vote.target] = self.block_vote_count[
-            vote.source].get(vote.target, 0) + vote.deposit
+        link = self.link_tally.add(vote, self.network.validators[vote.validator].deposit)
+
+        if self.config.aggregators and self.id in self.network.aggregators(vote.target_height):
+            self.collect_vote(vote)
 
         # Reward node for correct vote.
         # self.network.reward_node(vote.validator)
 
         # Enough votes have been received.
-        if (self.block_vote_count[vote.source][vote.target] > (self.network.total_deposit * 2) // 3):
-            
-            # Justify target
-            self.justified_checkpoints.add(vote.target)
+        if self.is_supermajority(link):
+            self.justify_link(link, [vote.validator])
 
-            # Update highest justified checkpoint.
-            if vote.target_height > self.highest_justified_checkpoint.checkpoint_height:
-                self.highest_justified_checkpoint = self.received[vote.target]
+        return True
+
+    def check_aggregate(self, aggregate):
+        '''
+        Function checks an aggregate of votes for a link once
+        for all its voters, whose votes were checked by the
+        aggregator, and counts them as check_vote would.
+        '''
 
-            # Finalise source if parent of target.
-            if vote.source_height == vote.target_height - 1:
-                self.network.reward_node(vote.validator)
-                self.finalised_checkpoints.add(vote.source)
+        # Haven't received source block yet.
+        if not self.has_block(aggregate.source):
+            self.add_message_buffer(aggregate.source, aggregate)
+
+        # Assert source is justified.
+        if aggregate.source not in self.justified_checkpoints:
+            return False
+
+        # Haven't received target block.
+        if not self.has_block(aggregate.target):
+            self.add_message_buffer(aggregate.target, aggregate)
+            return False
+
+        # Assert source is ancestor of target.
+        if not self.is_ancestor(aggregate.source, aggregate.target):
+            return False
+
+        link, voters = self.link_tally.add_aggregate(aggregate, self.network.validators)
+
+        # Enough votes have been received.
+        if self.is_supermajority(link):
+
+            # Reward as check_vote does, the voter whose vote crosses the
+            # supermajority, or every voter counted once it was reached.
+            threshold = self.supermajority_stake(link.target_height)
+            stake = link.stake - sum(self.network.validators[validator].deposit for validator in voters)
+
+            rewarded = voters
+            if stake <= threshold:
+                for validator in voters:
+                    stake += self.network.validators[validator].deposit
+                    if stake > threshold:
+                        rewarded = [validator]
+                        break
+
+            self.justify_link(link, rewarded)
 
         return True
 
+    def collect_vote(self, vote):
+        '''
+        Function adds a valid vote to the aggregate of its link,
+        sent once the aggregation window has passed.
+        '''
+
+        key = (vote.source, vote.target)
+
+        if key not in self.aggregates:
+            send_time = self.network.time + self.config.aggregation_window
+            self.aggregates[key] = (send_time, vote, {})
+            self.network.schedule(send_time)
+
+        self.aggregates[key][2][vote.validator] = vote.deposit
+
+    def send_aggregates(self, time):
+        '''
+        Function broadcasts aggregates whose window has passed.
+        '''
+
+        for key, (send_time, vote, deposits) in list(self.aggregates.items()):
+
+            if send_time <= time:
+
+                del self.aggregates[key]
+
+                aggregate = AggregateVote(vote.source, vote.target,
+                                          vote.source_height, vote.target_height,
+                                          self.id, deposits, self.network.rng)
+
+                self.network.broadcast(aggregate, self.id)
+
+    def supermajority_stake(self, height):
+        return (self.network.voting_deposit(height) * 2) // 3
+
+    def is_supermajority(self, link):
+        return link.stake > self.supermajority_stake(link.target_height)
+
+    def justify_link(self, link, voters=()):
+        '''
+        Function justifies the target of a supermajority link, and
+        finalises its source if the target is the next checkpoint.
+        The voters whose votes completed the link are rewarded.
+        '''
+
+        if not link.justified:
+            self.link_tally.justify(link)
+            
+        # Justify target
+        if link.target not in self.justified_checkpoints:
+            self.justified_checkpoints.add(link.target)
+            self.network.emit('justify', self.id, height=link.target_height, hash=link.target)
+
+        # Update highest justified checkpoint.
+        if link.target_height > self.highest_justified_checkpoint.checkpoint_height:
+            self.highest_justified_checkpoint = self.get_block(link.target)
+            self.update_justified_head()
+
+            # Links below the justified checkpoint can no longer be used.
+            self.link_tally.prune(link.target_height)
+
+        # Finalise source if parent of target.
+        if link.source_height == link.target_height - 1:
+            for validator in voters:
+                self.network.reward_node(validator)
+
+            if link.source not in self.finalised_checkpoints:
+                self.finalised_checkpoints.add(link.source)
+
+                # Time since checkpoint was proposed.
+                store = self.network.block_store
+                latency = self.network.time - store.times[store.index[link.source]]
+                self.network.emit('finalise', self.id, height=link.source_height,
+                                  hash=link.source, latency=latency)
+
+    def update_deposit(self, validator, amount):
+        '''
+        Function applies a change in a validator's deposit to
+        the links it voted for, justifying links that reach
+        a supermajority.
+        '''
+
+        for link in self.link_tally.update_deposit(validator, amount):
+            if self.is_supermajority(link):
+                self.justify_link(link)
+
     
     def deliver(self, message):
         '''
@@ -264,21 +399,43 @@ class CasperValidator(Node):
         '''
 
         # Ignore duplicates.
-        if message.hash in self.received:
+        if self.has_received(message.hash):
             return False
 
-        if isinstance(message, Block):
-            accepted = self.accept_block(message)
-        elif isinstance(message, VoteMessage):
-            accepted = self.check_vote(message)
+        # Messages to process, buffered messages are processed
+        # depth first in the order they were buffered.
+        pending = [message]
 
-        if accepted:
-            
-            # Mark as processed.
-            self.received[message.hash] = message
-            
-            # Check message buffer.
-            if message.hash in self.message_buffer:
-                for d in self.message_buffer[message.hash]:
-                    self.deliver(d)
-                del self.message_buffer[message.hash]
+        while pending:
+
+            message = pending.pop()
+
+            if self.has_received(message.hash):
+                continue
+
+            if isinstance(message, Block):
+                accepted = self.accept_block(message)
+            elif isinstance(message, VoteMessage):
+                accepted = self.check_vote(message)
+            elif isinstance(message, AggregateVote):
+                accepted = self.check_aggregate(message)
+
+            if accepted:
+                
+                # Mark as processed.
+                self.mark_received(message)
+                
+                # Check message buffer.
+                if message.hash in self.message_buffer:
+                    pending.extend(reversed(self.pop_message_buffer(message.hash)))
+
+    def execute(self, time):
+        '''
+        Function simulates a unit of time passing in the validator,
+        sending aggregates of votes collected as an aggregator.
+        '''
+
+        super(CasperValidator, self).execute(time)
+
+        if self.aggregates:
+            self.send_aggregates(time)
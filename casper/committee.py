@@ -0,0 +1,57 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+import numpy as np
+
+
+class Committees():
+    '''
+    Class samples a committee of validators, weighted by deposit,
+    for each checkpoint epoch. Only votes of the committee of the
+    target epoch count towards justifying a link.
+    '''
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+
+        # Ids of committee members by epoch.
+        self.members = {}
+
+        # Current deposits of each epoch's committee.
+        self.deposits = {}
+
+        # Epochs each validator is a member of.
+        self.epochs = {}
+
+    def committee(self, epoch, validators):
+        '''
+        Function returns the members of an epoch's committee,
+        sampled from the validators' deposits on first use.
+        '''
+
+        if epoch not in self.members:
+
+            deposits = np.array([validator.deposit for validator in validators])
+            size = min(self.size, len(validators))
+
+            chosen = self.rng.choice(len(validators), size, replace=False, p=deposits / deposits.sum())
+
+            self.members[epoch] = frozenset(validators[i].id for i in chosen)
+            self.deposits[epoch] = deposits[chosen].sum()
+
+            for i in chosen:
+                self.epochs.setdefault(validators[i].id, []).append(epoch)
+
+        return self.members[epoch]
+
+    def update_deposit(self, validator, amount):
+        '''
+        Function applies a change in a validator's deposit
+        to the committees it is a member of.
+        '''
+        for epoch in self.epochs.get(validator, ()):
+            self.deposits[epoch] += amount
@@ -4,41 +4,179 @@ Marco Marasco 834482
 Austen McClernon 834063
 '''
 
-import random
-from helper.parameters import *
+import random, heapq, pickle, zlib
+import numpy as np
+from helper.config import SimConfig
 from helper.hash_gen import generate_hash
-from casper.block import Block
+from casper.block import Block, GENESIS
+from casper.blockstore import BlockStore
+from casper.committee import Committees
+from casper.topology import Topology
 from collections import defaultdict
 
 
+# Recipients up to which a message's delivery is grouped in Python.
+SMALL_SEND = 32
+
+
 class Network(object):
     '''
     Network class to simulate the
     blockchain environment.
     '''
 
-    def __init__(self, _latency):
+    def __init__(self, _latency, seed=None, config=None):
+
+        # Parameters of the simulation.
+        self.config = config if config is not None else SimConfig()
 
         self.validators = []
         self.time = 0
         self.messages = defaultdict(list)
         self.latency = _latency
 
+        # Random generators for hashes and Byzantine choices, and
+        # for batched latencies, independent of committee sampling.
+        self.rng = random.Random(seed)
+        streams = np.random.SeedSequence(seed).spawn(2)
+        self.latency_rng = np.random.default_rng(streams[0])
+
+        # Ids of registered validators.
+        self.validator_ids = np.empty(0, dtype=int)
+
+        # Latencies, bandwidth and partitions between validators.
+        self.topology = Topology(self.config)
+
+        # Heap of pending delivery times for event driven execution.
+        self.message_times = []
+
         self.to_reward = set()
         self.to_slash = set()
 
+        # Validator that sent the message being delivered.
+        self.sender = None
+
+        # Validators waiting on a block from a peer, by peer id and hash.
+        self.requests = {}
+
+        # Sinks receiving events as they occur.
+        self.sinks = []
+
         self.root = Block()
 
+        # Blocks proposed in the network.
+        self.block_store = BlockStore(GENESIS)
+
         # Total sum of deposits across validators.
-        self.total_deposit = INITIAL_DEPOSIT * VALIDATORS
+        self.total_deposit = self.config.initial_deposit * self.config.validators
+
+        # Committees voting in each checkpoint epoch, or every validator.
+        self.committees = None
+        if self.config.committee_size:
+            self.committees = Committees(self.config.committee_size, streams[1])
+
+
+    def __getstate__(self):
+
+        # Sinks hold open files, they are not part of a snapshot.
+        state = self.__dict__.copy()
+        state['sinks'] = []
+        return state
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def close_sinks(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def emit(self, event, validator, **data):
+        '''
+        Function passes an event at the current time to the sinks.
+        '''
+        for sink in self.sinks:
+            sink.emit(self.time, event, validator, data)
 
+    def reseed(self, seed):
+        '''
+        Function replaces the network's random generators,
+        to continue a simulation as a different scenario.
+        '''
+        self.rng = random.Random(seed)
+
+        streams = np.random.SeedSequence(seed).spawn(2)
+        self.latency_rng = np.random.default_rng(streams[0])
+
+        if self.committees is not None:
+            self.committees.rng = np.random.default_rng(streams[1])
+
+    def snapshot(self):
+        '''
+        Function serialises the network, its validators and
+        pending messages to compressed bytes.
+        '''
+        return zlib.compress(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def restore(data):
+        '''
+        Function recreates a network from a snapshot.
+        '''
+        return pickle.loads(zlib.decompress(data))
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.snapshot())
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'rb') as f:
+            return Network.restore(f.read())
 
     def register(self, validators):
         self.validators.append(validators)
+        self.validator_ids = np.append(self.validator_ids, validators.id)
+
+
+    def generate_latency(self, node_id, recipients):
+        return self.topology.sample(self, node_id, recipients)
+
+    def record_block(self, block):
+        self.block_store.add(block, self.time)
 
+    def update_deposit(self, node, amount):
+        '''
+        Function notifies validators of a change
+        in a validator's deposit.
+        '''
+        if self.committees is not None:
+            self.committees.update_deposit(node, amount)
+
+        for validator in self.validators:
+            validator.update_deposit(node, amount)
 
-    def generate_latency(self):
-        return 1 + int(random.expovariate(1) * self.latency)
+    def in_committee(self, node, epoch):
+        '''
+        Function checks if a validator votes in a checkpoint epoch.
+        '''
+
+        if self.committees is None:
+            return True
+
+        return node in self.committees.committee(epoch, self.validators)
+
+    def voting_deposit(self, epoch):
+        '''
+        Function returns the deposit of validators voting in a
+        checkpoint epoch, a supermajority link needs two thirds.
+        '''
+
+        if self.committees is None:
+            return self.total_deposit
+
+        self.committees.committee(epoch, self.validators)
+
+        return self.committees.deposits[epoch]
 
     def slash_node(self, node):
         self.to_slash.add(node)
@@ -48,23 +186,165 @@ class Network(object):
         self.to_reward.add(node)
 
 
-    def broadcast(self, msg, node_id):       
+    def aggregators(self, epoch):
         '''
-        Function broadcasts a message to validators
-        in the network with varying latencies.
+        Function returns the ids of validators aggregating votes
+        for checkpoints of an epoch, in turn between epochs.
         '''
 
-        for node in self.validators:
-            
-            if node == node_id:
-                continue
+        count = min(self.config.aggregators, len(self.validators))
+
+        return [self.validators[(epoch * count + i) % len(self.validators)].id for i in range(count)]
 
-            # Create delay
-            delay = self.generate_latency()
+    def broadcast(self, msg, node_id, recipients=None):       
+        '''
+        Function broadcasts a message to validators, or only to the
+        given recipient ids, in the network with varying latencies.
+        In gossip mode a broadcast is sent to random peers instead,
+        which relay it on.
+        '''
+
+        # Time the message was first sent, if gossiped.
+        origin = None
+
+        if recipients is None and self.config.gossip_fanout > 0:
+
+            self.validators[node_id].relayed.add(msg.hash)
+            origin = self.time
+
+            recipients = self.peers(node_id)
+
+        elif recipients is None:
+            recipients = self.validator_ids[self.validator_ids != node_id]
+
+        else:
+            recipients = np.array(recipients, dtype=int)
+            recipients = recipients[recipients != node_id]
+
+        self.send(msg, node_id, recipients, origin)
+
+    def peers(self, node_id):
+        '''
+        Function samples the peers a validator gossips a message to.
+        '''
+
+        size = len(self.validator_ids) - 1
+
+        # Sample positions among the other validators, ids are positions.
+        peers = self.latency_rng.choice(size, min(self.config.gossip_fanout, size), replace=False)
+        peers[peers >= node_id] += 1
+
+        return peers
+
+    def relay(self, node, msg, origin):
+        '''
+        Function relays a gossiped message the first time a validator
+        receives it, and returns False for redundant deliveries.
+        '''
+
+        if msg.hash in node.relayed:
+            self.emit('redundant', node.id)
+            return False
+
+        node.relayed.add(msg.hash)
+        self.emit('propagate', node.id, delay=self.time - origin)
+
+        self.send(msg, node.id, self.peers(node.id), origin)
+
+        return True
+
+    def request(self, node_id, block_hash):
+        '''
+        Function asks the peer that sent the message being delivered
+        for a block the validator is missing, so validators missed
+        by gossip are not stalled waiting for it.
+        '''
+
+        if self.sender is None or self.sender == node_id:
+            return
+
+        self.emit('fetch', node_id)
+        self.send(BlockRequest(block_hash, node_id), node_id, np.array([self.sender]))
+
+    def answer(self, node, request):
+        '''
+        Function sends a requested block to the validator requesting
+        it once the peer has received it.
+        '''
+
+        if request.block_hash in node.relayed or node.has_block(request.block_hash):
+            block = self.block_store.blocks[self.block_store.index[request.block_hash]]
+            self.send(block, node.id, np.array([request.validator]))
+        else:
+            self.requests.setdefault((node.id, request.block_hash), []).append(request.validator)
+
+    def send(self, msg, node_id, recipients, origin=None):
+        '''
+        Function schedules the delivery of a message to recipients,
+        gossiped messages, with the time they were first sent, are
+        relayed by recipients.
+        '''
+
+        # Create delays
+        delays = self.generate_latency(node_id, recipients)
+
+        # Group recipients by delay into bitmasks over validator ids,
+        # in Python for few recipients such as gossip peers.
+        if len(recipients) <= SMALL_SEND:
+
+            masks = {}
+            for recipient, delay in zip(recipients.tolist(), delays.tolist()):
+                masks[delay] = masks.get(delay, 0) | 1 << recipient
+
+        else:
+
+            group_delays, groups = np.unique(delays, return_inverse=True)
+            flags = np.zeros((len(group_delays), len(self.validators)), dtype=bool)
+            flags[groups, recipients] = True
+            packed = np.packbits(flags, axis=1, bitorder='little')
+
+            masks = {delay: int.from_bytes(mask.tobytes(), 'little')
+                     for delay, mask in zip(group_delays.tolist(), packed)}
+
+        for delay, mask in masks.items():
 
             deliver_time = self.time + delay
 
-            self.messages[deliver_time].append((node.id, msg))
+            # Schedule new delivery time.
+            if deliver_time not in self.messages:
+                heapq.heappush(self.message_times, deliver_time)
+
+            self.messages[deliver_time].append((mask, msg, origin, node_id))
+
+    def schedule(self, time):
+        '''
+        Function makes a logical time an event,
+        so validators execute at that time.
+        '''
+
+        if time not in self.messages:
+            heapq.heappush(self.message_times, time)
+            self.messages[time] = []
+
+    def next_event_time(self):
+        '''
+        Function returns the next logical time at which
+        a message is delivered or a block is proposed.
+        '''
+
+        # Discard delivery times already processed.
+        while self.message_times and (self.message_times[0] < self.time or
+                                      self.message_times[0] not in self.messages):
+            heapq.heappop(self.message_times)
+
+        # Next round robin proposal.
+        block_frequency = self.config.block_frequency
+        next_proposal = -(-self.time // block_frequency) * block_frequency
+
+        if self.message_times:
+            return min(self.message_times[0], next_proposal)
+
+        return next_proposal
 
     def execute(self):
         '''
@@ -72,12 +352,74 @@ class Network(object):
         a unit of time throughout the network.
         '''
 
+        self.process_time()
+
+        self.time += 1
+
+    def run(self, end_time):
+        '''
+        Function simulates the network up to (but excluding)
+        end_time, jumping directly between logical times at
+        which an event occurs. Produces the same results as
+        calling execute() once per unit of time.
+        '''
+
+        while True:
+
+            event_time = self.next_event_time()
+
+            if event_time >= end_time:
+                break
+
+            # Skip idle time.
+            self.time = event_time
+
+            self.process_time()
+
+            self.time += 1
+
+        self.time = max(self.time, end_time)
+
+    def process_time(self):
+        '''
+        Function processes all events occurring at
+        the current logical time.
+        '''
+
+        # Discard delivery times up to now, ticking never looks for the next event.
+        while self.message_times and self.message_times[0] <= self.time:
+            heapq.heappop(self.message_times)
+
         # Check for messages to be sent
         if self.time in self.messages:
 
-            for _id, msg in self.messages[self.time]:
+            for recipients, msg, origin, sender in self.messages[self.time]:
+
+                self.sender = sender
+
+                # Deliver to recipients in order of id.
+                while recipients:
+                    lowest = recipients & -recipients
+                    recipients ^= lowest
+
+                    node = self.validators[lowest.bit_length() - 1]
 
-                self.validators[_id].deliver(msg)
+                    if isinstance(msg, BlockRequest):
+                        self.answer(node, msg)
+                        continue
+
+                    # Drop gossiped messages already received.
+                    if origin is not None and not self.relay(node, msg, origin):
+                        continue
+
+                    # Pass the block on to validators that requested it.
+                    if self.requests and (node.id, msg.hash) in self.requests:
+                        requesters = self.requests.pop((node.id, msg.hash))
+                        self.send(msg, node.id, np.array(requesters))
+
+                    node.deliver(msg)
+
+            self.sender = None
 
             # Remove messages
             del self.messages[self.time]
@@ -87,24 +429,39 @@ class Network(object):
             node.execute(self.time)
 
 
-        # Reward and slash nodes.
+        self.apply_deposits()
+
+    def apply_deposits(self):
+        '''
+        Function rewards and slashes nodes marked
+        during the current time.
+        '''
+
         for node in list(self.to_reward):
-            self.total_deposit += self.validators[node].reward()
+            amount = self.validators[node].reward()
+            self.total_deposit += amount
+            self.update_deposit(node, amount)
+            self.emit('reward', node, amount=amount)
         
         for node in list(self.to_slash):
-            self.total_deposit -= self.validators[node].slash()
+            amount = self.validators[node].slash()
+            self.total_deposit -= amount
+            self.update_deposit(node, -amount)
+            self.emit('slash', node, amount=amount)
 
         self.to_reward.clear()
         self.to_slash.clear()
 
-        self.time += 1
-
 
 class VoteMessage():
     '''
     Class contains structure for votes through network.
     '''
-    def __init__(self, source, target, source_height, target_height, validator, deposit):
+
+    __slots__ = ('source', 'target', 'source_height', 'target_height',
+                 'validator', 'hash', 'deposit')
+
+    def __init__(self, source, target, source_height, target_height, validator, deposit, rng=random):
         self.source = source
         self.target = target
         self.source_height = source_height
@@ -114,8 +471,53 @@ class VoteMessage():
         self.validator = validator
         
         # Unique hash for vote.
-        self.hash = generate_hash()
+        self.hash = generate_hash(rng)
         
         # Deposit from validator.
         self.deposit = deposit
 
+
+class BlockRequest():
+    '''
+    Class contains structure for requests of a missing
+    block from a peer.
+    '''
+
+    __slots__ = ('block_hash', 'validator')
+
+    def __init__(self, block_hash, validator):
+        self.block_hash = block_hash
+
+        # Requesting validator ID.
+        self.validator = validator
+
+
+class AggregateVote():
+    '''
+    Class contains structure for votes of several validators
+    for the same link, merged by an aggregator.
+    '''
+
+    __slots__ = ('source', 'target', 'source_height', 'target_height',
+                 'validator', 'voters', 'deposits', 'stake', 'hash')
+
+    def __init__(self, source, target, source_height, target_height, validator, deposits, rng=random):
+        self.source = source
+        self.target = target
+        self.source_height = source_height
+        self.target_height = target_height
+
+        # Aggregator ID.
+        self.validator = validator
+
+        # Deposits of validators voting, by ID.
+        self.deposits = deposits
+
+        # Bitfield of validator ids voting, and their total deposit.
+        self.voters = 0
+        for voter in deposits:
+            self.voters |= 1 << voter
+        self.stake = sum(deposits.values())
+
+        # Unique hash for aggregate.
+        self.hash = generate_hash(rng)
@@ -4,13 +4,10 @@ Marco Marasco 834482
 Austen McClernon 834063
 '''
 
-from casper.block import Block
+from casper.block import Block, GENESIS
 from casper.network import VoteMessage
-from helper.parameters import *
-from collections import defaultdict
-
-# Create root.
-GENESIS = Block()
+from collections import defaultdict, deque
+import math
 
 class Node(object):
     '''
@@ -21,10 +18,33 @@ class Node(object):
     def __init__(self, network, _id):
 
         self.id = _id
-        self.received = {GENESIS.hash: GENESIS}
-        # self.received = {}
 
+        # Rows of the network's block store received, genesis is row 0.
+        self.seen = bytearray(b'\x01')
+
+        # Hashes of processed votes.
+        self.received_votes = set()
+
+        # Hashes of gossiped messages received, relayed only once.
+        self.relayed = set()
+
+        # Messages waiting on a missing block, by hash of the block.
         self.message_buffer = {}
+        self.buffer_size = 0
+
+        # (hash, message) in the order messages were buffered, including
+        # messages since resolved or evicted, for oldest first eviction.
+        self.buffer_order = deque()
+
+        # Lowest height the buffer was last scanned to evict below, and the
+        # lowest height buffered since, so scans only run when they can evict.
+        self.scanned_height = -1
+        self.lowest_buffered = math.inf
+
+        # Counts of messages buffered, evicted from and resolved out of the buffer.
+        self.buffered_count = 0
+        self.evicted_count = 0
+        self.resolved_count = 0
 
         self.proposed_blocks = []
         self.proposed_votes = []
@@ -35,12 +55,9 @@ class Node(object):
         
         self.network = network
         self.network.register(self)
-        
-        # Path are for checkpoints, the value is last block before next checkpoint.
-        self.paths = {GENESIS.hash: GENESIS}
 
-        # Closest checkpoint ancestor for each block.
-        self.path_membership = {GENESIS.hash: GENESIS.hash}
+        # Parameters of the simulation, shared with the network.
+        self.config = network.config
 
         self.slashed = False
 
@@ -55,45 +72,175 @@ class Node(object):
         '''
         if hash_ not in self.message_buffer:
             self.message_buffer[hash_] = []
+
+            # Gossip may never deliver the block, ask a peer for it.
+            if self.config.gossip_fanout:
+                self.network.request(self.id, hash_)
+
         self.message_buffer[hash_].append(obj)
+        self.buffer_order.append((hash_, obj))
 
+        if self.config.buffer_eviction == 'height':
+            self.lowest_buffered = min(self.lowest_buffered, self.message_height(obj))
 
-    def get_checkpoint_parent(self, block):
+        self.buffer_size += 1
+        self.buffered_count += 1
+
+        if self.buffer_size > self.config.buffer_cap:
+            self.evict_message_buffer()
+
+        # Drop messages no longer buffered from the order once they outnumber the buffer.
+        elif len(self.buffer_order) > 2 * self.buffer_size + 64:
+            self.buffer_order = deque(entry for entry in self.buffer_order if self.is_buffered(*entry))
+
+    def is_buffered(self, hash_, message):
+        return hash_ in self.message_buffer and message in self.message_buffer[hash_]
+
+    def pop_message_buffer(self, hash_):
+        '''
+        Remove and return messages waiting on a received block.
+        '''
+        messages = self.message_buffer.pop(hash_, [])
+        self.buffer_size -= len(messages)
+        self.resolved_count += len(messages)
+        return messages
+
+    def message_height(self, message):
+        '''
+        Height of the block a message refers to.
+        '''
+        if isinstance(message, Block):
+            return message.height
+        return message.target_height * self.config.checkpoint_diff
+
+    def evict_message_buffer(self):
+        '''
+        Evict messages until the buffer is within its capacity.
+        '''
+
+        # Evict messages too far below the current head.
+        if self.config.buffer_eviction == 'height':
+
+            min_height = self.head.height - self.config.buffer_height_window * self.config.checkpoint_diff
+
+            # Scan only if the head moved up or lower messages were buffered since the last scan.
+            if min_height > self.scanned_height or self.lowest_buffered < min_height:
+
+                self.scanned_height = min_height
+                self.lowest_buffered = math.inf
+
+                for hash_ in list(self.message_buffer):
+
+                    messages = self.message_buffer[hash_]
+                    kept = [m for m in messages if self.message_height(m) >= min_height]
+
+                    if len(kept) < len(messages):
+                        self.buffer_size -= len(messages) - len(kept)
+                        self.evicted_count += len(messages) - len(kept)
+
+                        if kept:
+                            self.message_buffer[hash_] = kept
+                        else:
+                            del self.message_buffer[hash_]
+
+        # Evict oldest messages.
+        while self.buffer_size > self.config.buffer_cap:
 
-        # Genesis
-        if block.height == 0:
-            return None
+            hash_, message = self.buffer_order.popleft()
 
-        return self.received[self.path_membership[block.parent_hash]]
+            # Resolved or evicted by height already.
+            if not self.is_buffered(hash_, message):
+                continue
+
+            messages = self.message_buffer[hash_]
+
+            messages.remove(message)
+            self.buffer_size -= 1
+            self.evicted_count += 1
+
+            if not messages:
+                del self.message_buffer[hash_]
+
+
+    def has_block(self, _hash):
+        '''
+        Check if a block has been received.
+        '''
+        row = self.network.block_store.index.get(_hash)
+        return row is not None and row < len(self.seen) and self.seen[row] == 1
+
+    def has_received(self, _hash):
+        '''
+        Check if a block or vote has been processed.
+        '''
+        return _hash in self.received_votes or self.has_block(_hash)
+
+    def mark_received(self, message):
+        '''
+        Record a message as processed.
+        '''
+
+        if isinstance(message, Block):
+
+            row = self.network.block_store.index[message.hash]
+
+            # Extend over blocks added since.
+            if row >= len(self.seen):
+                self.seen.extend(bytes(row + 1 - len(self.seen)))
+
+            self.seen[row] = 1
+
+        else:
+            self.received_votes.add(message.hash)
+
+    def get_block(self, _hash):
+        return self.network.block_store.get(_hash)
+
+    def received_blocks(self):
+        '''
+        Generate received blocks in order of proposal.
+        '''
+
+        blocks = self.network.block_store.blocks
+
+        row = self.seen.find(1)
+        while row != -1:
+            yield blocks[row]
+            row = self.seen.find(1, row + 1)
+
+    def get_checkpoint_parent(self, block):
+        return self.network.block_store.get_checkpoint_parent(block)
 
     def is_ancestor(self, ancestor, descendant):
 
         # Get blocks via hash if provided.
         if not isinstance(ancestor, Block):
-            ancestor = self.received[ancestor]
+            ancestor = self.get_block(ancestor)
 
         if not isinstance(descendant, Block):
-            descendant = self.received[descendant]
+            descendant = self.get_block(descendant)
 
-        while True:
-            if descendant is None:
-                return False
-            if descendant.hash == ancestor.hash:
-                return True
-            descendant = self.get_checkpoint_parent(descendant)
+        return self.network.block_store.is_ancestor(ancestor, descendant)
 
 
     def slash(self):
         
-        slash_amount = self.deposit * SLASH
+        slash_amount = self.deposit * self.config.slash
         self.deposit -= slash_amount
         return slash_amount
 
     def reward(self):
-        reward_amount = self.deposit * REWARD
+        reward_amount = self.deposit * self.config.reward
         self.deposit += reward_amount
         return reward_amount
 
+    def update_deposit(self, validator, amount):
+        '''
+        Function notifies the node of a change in
+        a validator's deposit.
+        '''
+        pass
+
 
     def execute(self, time):
         '''
@@ -101,12 +248,16 @@ class Node(object):
         '''
 
         # Generate block for round robin.
-        if self.id == (time // BLOCK_FREQUENCY) % VALIDATORS and time % BLOCK_FREQUENCY == 0:
+        block_frequency = self.config.block_frequency
+
+        if self.id == (time // block_frequency) % self.config.validators and time % block_frequency == 0:
 
-            new_block = Block(self.head)
+            new_block = Block(self.head, self.network.rng, self.config.checkpoint_diff)
 
             self.proposed_blocks.append(new_block)
 
+            self.network.record_block(new_block)
+
             self.network.broadcast(new_block, self.id)
             
             self.deliver(new_block)
@@ -0,0 +1,62 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+import bisect
+
+
+class SlashingRecord():
+    '''
+    Class records the accepted votes of a validator,
+    indexed to check the Casper slashing conditions.
+    '''
+
+    def __init__(self):
+
+        # Accepted votes in arrival order.
+        self.votes = []
+
+        # Target heights voted for.
+        self.targets = set()
+
+        # Vote spans sorted by target height. As accepted spans never
+        # surround each other, source heights are sorted as well.
+        self.span_targets = []
+        self.span_sources = []
+
+    def violates(self, vote):
+        '''
+        Function determines if a vote violates a slashing
+        condition against the recorded votes.
+        '''
+
+        # Slashing condition 1.
+        if vote.target_height in self.targets:
+            return True
+
+        i = bisect.bisect_left(self.span_targets, vote.target_height)
+
+        # Slashing condition 2, closest lower span has the highest
+        # lower source and closest higher span the lowest higher source.
+        if i > 0 and self.span_sources[i - 1] > vote.source_height:
+            return True
+
+        if i < len(self.span_targets) and self.span_sources[i] < vote.source_height:
+            return True
+
+        return False
+
+    def add(self, vote):
+        '''
+        Function records an accepted vote.
+        '''
+
+        i = bisect.bisect_left(self.span_targets, vote.target_height)
+
+        self.span_targets.insert(i, vote.target_height)
+        self.span_sources.insert(i, vote.source_height)
+
+        self.targets.add(vote.target_height)
+        self.votes.append(vote)
@@ -0,0 +1,144 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+
+class Link():
+    '''
+    Class contains the votes counted for a
+    supermajority link between two checkpoints.
+    '''
+
+    __slots__ = ('source', 'target', 'source_height', 'target_height',
+                 'voters', 'stake', 'justified')
+
+    def __init__(self, vote):
+        self.source = vote.source
+        self.target = vote.target
+        self.source_height = vote.source_height
+        self.target_height = vote.target_height
+
+        # Bitset of validator ids counted.
+        self.voters = 0
+
+        # Current deposits of validators counted.
+        self.stake = 0
+
+        self.justified = False
+
+
+class LinkTally():
+    '''
+    Class tallies votes for each (source, target) link,
+    following the deposits of the validators counted.
+    '''
+
+    def __init__(self):
+
+        self.links = {}
+
+        # Links each validator counts towards that are not yet
+        # justified, kept in a dict to preserve voting order.
+        self.pending = {}
+
+        # Links to targets up to this checkpoint height no longer follow deposits.
+        self.pruned_height = 0
+
+    def add(self, vote, deposit):
+        '''
+        Function counts a vote towards its link, once per
+        validator, with the validator's current deposit, and
+        returns the link.
+        '''
+
+        key = (vote.source, vote.target)
+
+        if key not in self.links:
+            self.links[key] = Link(vote)
+
+        link = self.links[key]
+
+        # Count validator once.
+        if not link.voters >> vote.validator & 1:
+            self.count(link, vote.validator, deposit)
+
+        return link
+
+    def add_aggregate(self, aggregate, validators):
+        '''
+        Function counts the votes of an aggregate towards its
+        link, once per validator, with the current deposits of
+        the validators by id, and returns the link and the ids
+        newly counted, in the order they were counted.
+        '''
+
+        key = (aggregate.source, aggregate.target)
+
+        if key not in self.links:
+            self.links[key] = Link(aggregate)
+
+        link = self.links[key]
+
+        counted = []
+
+        # Count validators not yet counted, in order of id.
+        voters = aggregate.voters & ~link.voters
+        while voters:
+            lowest = voters & -voters
+            validator = lowest.bit_length() - 1
+            self.count(link, validator, validators[validator].deposit)
+            counted.append(validator)
+            voters ^= lowest
+
+        return link, counted
+
+    def count(self, link, validator, deposit):
+
+        link.voters |= 1 << validator
+        link.stake += deposit
+
+        if not link.justified and link.target_height > self.pruned_height:
+            self.pending.setdefault(validator, {})[link] = None
+
+    def justify(self, link):
+        '''
+        Function marks a link as justified, its stake
+        no longer needs to follow deposits. Voters of
+        pruned links may have no pending links.
+        '''
+
+        link.justified = True
+
+        voters = link.voters
+        while voters:
+            lowest = voters & -voters
+            self.pending.get(lowest.bit_length() - 1, {}).pop(link, None)
+            voters ^= lowest
+
+    def prune(self, height):
+        '''
+        Function stops links to targets at or below a justified
+        checkpoint height following deposits, so links on abandoned
+        forks are not updated for the rest of the run.
+        '''
+
+        self.pruned_height = height
+
+        for links in self.pending.values():
+            for link in [link for link in links if link.target_height <= height]:
+                del links[link]
+
+    def update_deposit(self, validator, amount):
+        '''
+        Function applies a change in a validator's deposit to
+        the pending links it counts towards and returns them.
+        '''
+
+        links = list(self.pending.get(validator, ()))
+
+        for link in links:
+            link.stake += amount
+
+        return links
@@ -0,0 +1,113 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+import numpy as np
+
+
+class Topology():
+    '''
+    Class models the links between validators. Validators are placed
+    in regions by id, each pair of regions has a mean latency and a
+    propagation delay, each validator can send a limited number of
+    messages per unit of time, and regions can be partitioned from
+    each other for windows of time.
+    '''
+
+    def __init__(self, config):
+
+        self.regions = config.regions
+
+        # Mean latency between regions, the network's latency if not given.
+        self.latency = None
+        if config.region_latency is not None:
+            self.latency = self.region_matrix(config.region_latency, float)
+
+        # Fixed delay between regions.
+        self.delay = None
+        if config.region_delay is not None:
+            self.delay = self.region_matrix(config.region_delay, int)
+
+        # Messages a validator sends per unit of time, 0 for no limit.
+        self.bandwidth = config.bandwidth
+
+        # Time each validator is free to send again.
+        self.busy = {}
+
+        # Windows of (start, end, group of each region), regions in
+        # different groups are disconnected, -1 reaches every group.
+        self.partitions = []
+        for start, end, groups in config.network_partitions:
+
+            group = np.full(self.regions, -1)
+            for i, regions in enumerate(groups):
+                group[list(regions)] = i
+
+            self.partitions.append((start, end, group))
+
+    def region_matrix(self, values, dtype):
+
+        matrix = np.array(values, dtype=dtype)
+
+        if matrix.shape != (self.regions, self.regions):
+            raise ValueError(f"Expected a {self.regions}x{self.regions} matrix, got {matrix.shape}")
+
+        return matrix
+
+    def sample(self, network, sender, recipients):
+        '''
+        Function samples the delays of a message from the sender
+        to each recipient, at the network's current time.
+        '''
+
+        rng = network.latency_rng
+
+        exponential = rng.exponential(1, len(recipients))
+
+        # Uniform latency across the network.
+        if self.latency is None and self.delay is None:
+            delays = 1 + (exponential * network.latency).astype(int)
+
+        else:
+
+            source = sender % self.regions
+            regions = recipients % self.regions
+
+            latency = network.latency if self.latency is None else self.latency[source, regions]
+            delays = 1 + (exponential * latency).astype(int)
+
+            if self.delay is not None:
+                delays += self.delay[source, regions]
+
+        if self.bandwidth:
+            delays += self.queue(network.time, sender, len(recipients), rng)
+
+        for start, end, group in self.partitions:
+
+            if not start <= network.time < end:
+                continue
+
+            # Hold messages across the partition until it heals.
+            source_group = group[sender % self.regions]
+            if source_group != -1:
+                groups = group[recipients % self.regions]
+                delays[(groups != -1) & (groups != source_group)] += end - network.time
+
+        return delays
+
+    def queue(self, time, sender, size, rng):
+        '''
+        Function returns the time each of size messages waits to
+        be sent by the sender, in random order of recipients, and
+        keeps the sender busy until they are sent.
+        '''
+
+        start = max(time, self.busy.get(sender, time))
+        self.busy[sender] = start + size / self.bandwidth
+
+        waits = np.empty(size, dtype=int)
+        waits[rng.permutation(size)] = (start - time + np.arange(size) / self.bandwidth).astype(int)
+
+        return waits
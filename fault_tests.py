@@ -4,13 +4,12 @@ Marco Marasco 834482
 Austen McClernon 834063
 '''
 
-import math, os, sys
-import pandas as pd
-from casper.block import Block
-from helper.parameters import *
+import math, os, hashlib, argparse, threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from helper.config import SimConfig
+from helper.cache import ResultCache, code_version
 from casper.network import Network
 from casper.caspervalidator import CasperValidator
-from helper.visualisation import plot_node_blockchains, plot_line_graphs
 
 
 def frac_just_fin(validator):
@@ -56,62 +55,193 @@ def below_highest_checkpoint(validator):
     '''
 
     val = 0
-    for block in validator.received.values():
+    for block in validator.received_blocks():
 
-        if isinstance(block, Block) and block.height <= validator.highest_justified_checkpoint.height:
+        if block.height <= validator.highest_justified_checkpoint.height:
             val += 1
 
     return val
 
 
-def run_tests(latencies, frac_byz, validator_set):
+class SerialExecutor(Executor):
     '''
-    Function runs tests on network for various input
-    parameters.
+    Executor that runs submitted jobs immediately
+    in the current process.
     '''
 
-    results = {}
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class CachedExecutor(Executor):
+    '''
+    Executor that reads job results from a cache, keyed by
+    the job, its arguments and code version, and submits only
+    missing jobs to another executor.
+    '''
+
+    def __init__(self, executor, cache):
+        self.executor = executor
+        self.cache = cache
+        self.version = code_version(SOURCES)
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+
+        key = self.cache.key(self.version, fn.__name__, cache_arguments(args), sorted(kwargs.items()))
+
+        result = self.cache.get(key)
+
+        if result is not None:
+            future = Future()
+            future.set_result(result)
+            return future
+
+        future = self.executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self.store(key, f))
+        return future
+
+    def store(self, key, future):
+        if future.exception() is None:
+            with self.lock:
+                self.cache.put(key, future.result())
+
+    def shutdown(self, wait=True, **kwargs):
+        self.executor.shutdown(wait, **kwargs)
+
+
+def cache_arguments(args):
+    '''
+    Function replaces configurations in job arguments with
+    the parameters that affect the result of a single sample.
+    '''
+
+    return [arg.items(exclude=SWEEP_PARAMETERS) if isinstance(arg, SimConfig) else arg
+            for arg in args]
+
+
+def create_executor(workers):
+    '''
+    Function creates a process pool for the given
+    number of workers, or runs jobs in process.
+    '''
+
+    if workers > 1:
+        return ProcessPoolExecutor(max_workers=workers)
+
+    return SerialExecutor()
+
+
+# Source of code affecting sample results.
+SOURCES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+           for path in ['casper', 'helper/hash_gen.py', 'helper/config.py', 'fault_tests.py']]
+
+# Parameters of sweeps and outputs, not affecting a sample.
+SWEEP_PARAMETERS = {'simulation_folder', 'plot', 'progressive_plot', 'plot_workers', 'fault_folder',
+                    'sample_size', 'workers', 'latencies', 'partitions', 'byzantines', 'cache_folder', 'cache_size'}
+
+
+def sample_seed(config, latency, frac_byz, validator_set, sample):
+    '''
+    Function derives a deterministic seed for a single
+    simulation from its parameters and sample number.
+    '''
+
+    key = repr((config.seed, latency, frac_byz, len(validator_set), sample)).encode()
+
+    return int(hashlib.sha256(key).hexdigest()[:16], 16)
+
+
+def run_sample(config, latency, frac_byz, validator_set, seed):
+    '''
+    Function runs a single simulation and returns the
+    measurements of each validator.
+    '''
+
+    # Create network and validators.
+    network = Network(latency, seed, config)
+    validators = [CasperValidator(network, i) for i in validator_set]
+
+    # Convert to Byzantine.
+    if frac_byz != 0:
+        for j in range(math.ceil(config.validators/frac_byz)):
+            validators[j].byzantine = True
+
+    # Run execution.
+    if config.event_driven:
+        network.run(config.end_time)
+    else:
+        for _ in range(config.end_time):
+            network.execute()
+
+    # Gather results.
+    measurements = []
+    for validator in validators:
+
+        justified_frac, finalised_frac = frac_just_fin(validator)
+
+        measurements.append((justified_frac, finalised_frac,
+                             validator.highest_justified_checkpoint.height + 1,
+                             below_highest_checkpoint(validator)))
+
+    return measurements
+
+
+def submit_tests(executor, config, latencies, frac_byz, validator_set):
+    '''
+    Function submits the samples of each latency
+    as independent jobs to the executor.
+    '''
+
+    jobs = {}
 
     for latency in latencies:
 
+        jobs[latency] = [executor.submit(run_sample, config, latency, frac_byz, validator_set,
+                                         sample_seed(config, latency, frac_byz, validator_set, i))
+                         for i in range(config.sample_size)]
+
+    return jobs
+
+
+def collect_tests(config, jobs):
+    '''
+    Function averages the results of submitted samples.
+    '''
+
+    results = {}
+
+    for latency in jobs:
+
         # Initialise variables.
         total_justified = 0.0
         total_finalised = 0.0
-        jtotal_finalised = 0.0
         total_main_chain = 0.0
         total_under_main = 0.0
 
-        # Perform tests.
-        for i in range(SAMPLE_SIZE):
-            
-            # Create network and validators.
-            network = Network(latency)
-            validators = [CasperValidator(network, i) for i in validator_set]
-
-            # Convert to Byzantine.
-            if frac_byz != 0:
-                for j in range(math.ceil(VALIDATORS/frac_byz)):
-                    validators[j].byzantine = True
+        # Gather results in sample order.
+        for job in jobs[latency]:
 
-            # Run execution.
-            for _ in range(BLOCK_FREQUENCY * CHECKPOINT_DIFF * CHECKPOINTS):
-                network.execute()
+            measurements = job.result()
 
-            # Gather results.
-            for validator in validators:
+            for justified_frac, finalised_frac, main_chain, under_main in measurements:
 
-                justified_frac, finalised_frac = frac_just_fin(validator)
                 total_justified += justified_frac
                 total_finalised += finalised_frac
 
-                total_main_chain += validator.highest_justified_checkpoint.height + 1
-                total_under_main += below_highest_checkpoint(validator)
+                total_main_chain += main_chain
+                total_under_main += under_main
 
         # Compute averages.
-        average_justified = total_justified / len(validators) / SAMPLE_SIZE
-        average_finalised = total_finalised / len(validators) / SAMPLE_SIZE
-        average_mainchain = total_main_chain / len(validators) / SAMPLE_SIZE
-        average_frac_of_main = total_main_chain / (len(validators) * SAMPLE_SIZE * (CHECKPOINT_DIFF * CHECKPOINTS + 1))
+        sample_size = config.sample_size
+        chain_size = config.checkpoint_diff * config.checkpoints + 1
+
+        average_justified = total_justified / len(measurements) / sample_size
+        average_finalised = total_finalised / len(measurements) / sample_size
+        average_mainchain = total_main_chain / len(measurements) / sample_size
+        average_frac_of_main = total_main_chain / (len(measurements) * sample_size * chain_size)
 
         print(f'Average Latency: {latency}')
         print(f'Average number justified: {average_justified}')
@@ -130,12 +260,23 @@ def run_tests(latencies, frac_byz, validator_set):
     return results
 
 
+def run_tests(executor, config, latencies, frac_byz, validator_set):
+    '''
+    Function runs tests on network for various input
+    parameters.
+    '''
+
+    return collect_tests(config, submit_tests(executor, config, latencies, frac_byz, validator_set))
+
+
 def collate_results(results):
     '''
     Function collates results from tests into
     a Pandas dataframe for later plotting.
     '''
 
+    import pandas as pd
+
     dfs = []
     for i in results:
         temp = pd.DataFrame(results[i])
@@ -147,73 +288,99 @@ def collate_results(results):
     return df
 
 
-def latency_test():
+def latency_test(executor, config):
     '''
     Function performs test over differing average
     network latency values.
     '''
         
     
-    num_validators = VALIDATORS
+    num_validators = config.validators
     
-    validator_set = list(range(VALIDATORS))
+    validator_set = list(config.validator_set)
     
-    results = run_tests(LATENCIES, 0, validator_set)
+    results = run_tests(executor, config, config.latencies, 0, validator_set)
 
     # Add in theoretical results.
-    for i in LATENCIES:
-        results[i]['Theoretical'] = 1 - (i/(i + BLOCK_FREQUENCY))
+    for i in config.latencies:
+        results[i]['Theoretical'] = 1 - (i/(i + config.block_frequency))
+
+    if not config.plot:
+        return
+
+    import pandas as pd
+    from helper.visualisation import plot_line_graphs
 
     df = pd.DataFrame(results)
     df = df.transpose()
 
     # Plot results.
-    plot_line_graphs(df, "Latency Impact on Casper", "Average Latency", "Percentage",  "LatencyImpact")
+    plot_line_graphs(df, "Latency Impact on Casper", "Average Latency", "Percentage",  "LatencyImpact", config.fault_folder)
 
 
-def partition_test():
+def partition_test(executor, config):
     '''
     Function performs test over differing
     network partition sizes.
     '''
 
-    latencies = [AVG_LATENCY]
+    latencies = [config.avg_latency]
+    jobs = {}
+    for frac in config.partitions:
+
+        # Create a subset of the total number of validators, disconnected
+        # validators keep their stake in the network's total deposit.
+        num_validators = int((1.0 - frac) * config.validators)
+        validator_set = list(config.validator_set)[:num_validators]
+        
+        jobs[frac] = submit_tests(executor, config, latencies, 0, validator_set)
+
     results = {}
-    for frac in PARTITIONS:
+    for frac in config.partitions:
 
         print(f"Fraction disconnected {frac}")
-        
-        # Create a subset of the total number of validators.
-        num_validators = int((1.0 - frac) * VALIDATORS)
-        validator_set = list(range(VALIDATORS))[:num_validators]
-        
-        results[frac] = run_tests(latencies, 0, validator_set)
+        results[frac] = collect_tests(config, jobs[frac])
 
 
+    if not config.plot:
+        return
+
+    from helper.visualisation import plot_line_graphs
+
     # Plot results.
-    plot_line_graphs(collate_results(results), "Partition Impact on Casper", "Network Partition", "Percentage", "PartitionImpact")
+    plot_line_graphs(collate_results(results), "Partition Impact on Casper", "Network Partition", "Percentage", "PartitionImpact", config.fault_folder)
     
-def byzantine_test():
+def byzantine_test(executor, config):
     '''
     Function performs test over differing fractions
     of Byzantine validators.
     '''
 
-    SAMPLE_SIZE = 10
-    latencies = [AVG_LATENCY]
+    latencies = [config.avg_latency]
     
-    results = {}
+    jobs = {}
     
-    for frac in BYZANTINES:
+    for frac in config.byzantines:
+
+        num_validators = config.validators
+        validator_set = list(config.validator_set)
+
+        jobs[frac] = submit_tests(executor, config, latencies, frac, validator_set)
+
+    results = {}
 
-        num_validators = VALIDATORS
-        validator_set = list(range(VALIDATORS))
+    for frac in config.byzantines:
 
         print(f"Fraction Byzantine 1/{frac}")
-        results[frac] = run_tests(latencies, frac, validator_set)
+        results[frac] = collect_tests(config, jobs[frac])
+
+    if not config.plot:
+        return
+
+    from helper.visualisation import plot_line_graphs
 
     # Plot results.
-    plot_line_graphs(collate_results(results), "Byzantine Impact on Casper", "Byzantine Fraction", "Percentage", "ByzantineImpact")
+    plot_line_graphs(collate_results(results), "Byzantine Impact on Casper", "Byzantine Fraction", "Percentage", "ByzantineImpact", config.fault_folder)
     
 
 
@@ -221,40 +388,57 @@ def main():
     '''
     Control function for method testing.
     '''
-    try:
 
-        if sys.argv[1] not in ['latency', 'network', 'byzantine', 'all']:
-            print("Wrong test configuration.")
-            sys.exit()
+    parser = argparse.ArgumentParser(description="Test Casper under varying failure scenarios.")
+    parser.add_argument('test_type', choices=['latency', 'network', 'byzantine', 'all'])
+    parser.add_argument('--workers', type=int,
+                        help="Number of processes to run samples in, defaults to WORKERS.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every sample instead of reading cached results.")
+    parser.add_argument('--no-plot', action='store_true',
+                        help="Only print results, without loading plotting libraries.")
+    SimConfig.add_arguments(parser)
+    args = parser.parse_args()
 
-    except:
-        print("Wrong test configuration.")
-        sys.exit()
+    config = SimConfig.from_args(args)
 
+    if args.no_plot:
+        config.plot = False
 
-    if not os.path.exists(FAULT_FOLDER):
-        os.makedirs(FAULT_FOLDER)
+    if args.workers is not None:
+        config.workers = args.workers
 
-    test_type = sys.argv[1]
+    if config.plot and not os.path.exists(config.fault_folder):
+        os.makedirs(config.fault_folder)
+
+    test_type = args.test_type
 
     print(f"Performing {test_type} simulation...")
-    if test_type == 'latency':
+    executor = create_executor(config.workers)
 
-        latency_test()
+    # Read previously computed samples.
+    if not args.no_cache:
+        executor = CachedExecutor(executor, ResultCache(config.cache_folder, config.cache_size))
 
-    elif test_type == 'network':
-        
-        partition_test()
-    
-    elif test_type == 'byzantine':
+    with executor:
 
-        byzantine_test()
+        if test_type == 'latency':
+
+            latency_test(executor, config)
+
+        elif test_type == 'network':
+            
+            partition_test(executor, config)
         
-    else:
+        elif test_type == 'byzantine':
+
+            byzantine_test(executor, config)
+            
+        else:
 
-        latency_test()
-        partition_test()
-        byzantine_test()
+            latency_test(executor, config)
+            partition_test(executor, config)
+            byzantine_test(executor, config)
 
 
 if __name__ == '__main__':
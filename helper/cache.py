@@ -0,0 +1,102 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Content addressed on-disk cache for simulation results.
+'''
+
+import os, json, hashlib
+
+
+def code_version(paths):
+    '''
+    Function hashes the source files found
+    in the given files and directories.
+    '''
+
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources += [os.path.join(path, f) for f in os.listdir(path) if f.endswith('.py')]
+        else:
+            sources.append(path)
+
+    digest = hashlib.sha256()
+    for source in sorted(sources):
+        with open(source, 'rb') as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+class ResultCache():
+    '''
+    Class stores JSON results in a folder, one file per key,
+    evicting least recently used results above a size limit.
+    '''
+
+    def __init__(self, folder, max_size):
+
+        self.folder = folder
+        self.max_size = max_size
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.size = sum(entry.stat().st_size for entry in os.scandir(folder))
+
+    def key(self, *parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key):
+        '''
+        Function returns a cached result, or None if missing.
+        '''
+
+        filename = self.path(key)
+
+        try:
+            with open(filename) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Mark as recently used.
+        os.utime(filename)
+
+        return result
+
+    def put(self, key, result):
+        '''
+        Function stores a result and evicts old results
+        while the cache is above its size limit.
+        '''
+
+        filename = self.path(key)
+
+        if os.path.exists(filename):
+            self.size -= os.path.getsize(filename)
+
+        with open(filename, 'w') as f:
+            json.dump(result, f)
+
+        self.size += os.path.getsize(filename)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+
+        entries = sorted(os.scandir(self.folder), key=lambda entry: entry.stat().st_mtime)
+
+        for entry in entries:
+
+            if self.size <= self.max_size:
+                break
+
+            self.size -= entry.stat().st_size
+            os.remove(entry.path)
@@ -0,0 +1,110 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Runtime configuration of simulations, defaulting
+to the values in helper/parameters.py.
+'''
+
+import ast, copy, json
+import helper.parameters
+
+
+def defaults():
+    '''
+    Function returns the default parameters, by lowercase name.
+    '''
+    return {name.lower(): value for name, value in vars(helper.parameters).items() if name.isupper()}
+
+
+class SimConfig():
+    '''
+    Class holds the parameters of a simulation. Parameters are
+    attributes named as in helper/parameters.py, in lowercase.
+    '''
+
+    def __init__(self, **overrides):
+
+        # Copy lists of the defaults, so editing a config leaves them intact.
+        for name, value in defaults().items():
+            setattr(self, name, copy.deepcopy(value))
+
+        self.update(**overrides)
+
+    def __repr__(self):
+        items = ', '.join(f"{name}={value!r}" for name, value in self.items())
+        return f"SimConfig({items})"
+
+    def update(self, **overrides):
+        '''
+        Function overrides parameters, names are case insensitive.
+        '''
+
+        names = defaults()
+
+        for name, value in overrides.items():
+
+            if name.lower() not in names:
+                raise ValueError(f"Unknown parameter {name}")
+
+            setattr(self, name.lower(), value)
+
+        return self
+
+    def copy(self, **overrides):
+        return SimConfig(**copy.deepcopy(dict(self.items()))).update(**overrides)
+
+    def items(self, exclude=()):
+        '''
+        Function returns the parameters sorted by name,
+        without the excluded names.
+        '''
+        return sorted((name, value) for name, value in vars(self).items() if name not in exclude)
+
+    @property
+    def validator_set(self):
+        return tuple(range(self.validators))
+
+    @property
+    def end_time(self):
+        return self.block_frequency * self.checkpoint_diff * self.checkpoints
+
+    @classmethod
+    def from_file(cls, filename):
+        '''
+        Function creates a configuration overriding the
+        defaults with a JSON object of parameters.
+        '''
+        with open(filename) as f:
+            return cls(**json.load(f))
+
+    @staticmethod
+    def add_arguments(parser):
+        parser.add_argument('--config', metavar='FILE',
+                            help="JSON file of parameters overriding helper/parameters.py.")
+        parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                            help="Override a parameter, applied after --config.")
+
+    @classmethod
+    def from_args(cls, args):
+        '''
+        Function creates a configuration from the
+        --config and --set command line arguments.
+        '''
+
+        config = cls.from_file(args.config) if args.config else cls()
+
+        for override in args.set:
+
+            name, _, value = override.partition('=')
+
+            # Parse Python literals, otherwise keep as a string.
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                pass
+
+            config.update(**{name.strip(): value})
+
+        return config
@@ -6,5 +6,9 @@ Austen McClernon 834063
 
 import random
 
-def generate_hash():
-    return random.randint(1, 10**30)
+def generate_hash(rng=random):
+    '''
+    Generate a 64-bit hash from the given random
+    generator, defaults to the global generator.
+    '''
+    return rng.randint(1, 2**64 - 1)
@@ -0,0 +1,144 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Sinks for events emitted while a simulation runs.
+'''
+
+import csv
+from collections import Counter, deque
+
+
+# Fields of an event record.
+FIELDS = ['time', 'event', 'validator', 'height', 'latency', 'amount', 'delay']
+
+
+class MetricsSink():
+    '''
+    Base class for sinks receiving simulation events.
+    '''
+
+    def emit(self, time, event, validator, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class CounterSink(MetricsSink):
+    '''
+    Sink counting events, in total and per validator.
+    '''
+
+    def __init__(self):
+        self.counts = Counter()
+        self.validator_counts = Counter()
+
+    def emit(self, time, event, validator, data):
+        self.counts[event] += 1
+        self.validator_counts[(event, validator)] += 1
+
+
+class CSVSink(MetricsSink):
+    '''
+    Sink writing events as rows of a CSV file.
+    '''
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def emit(self, time, event, validator, data):
+        self.writer.writerow(dict(data, time=time, event=event, validator=validator))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink(MetricsSink):
+    '''
+    Sink collecting events and writing them
+    to a Parquet file when closed.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.rows = []
+
+    def emit(self, time, event, validator, data):
+        self.rows.append(dict(data, time=time, event=event, validator=validator))
+
+    def close(self):
+        import pandas as pd
+        pd.DataFrame(self.rows, columns=FIELDS).to_parquet(self.filename)
+
+
+class RollingSink(MetricsSink):
+    '''
+    Sink aggregating events over a rolling window
+    of logical time.
+    '''
+
+    def __init__(self, window):
+        self.window = window
+
+        # Events in window, oldest first.
+        self.events = deque()
+        self.counts = Counter()
+
+        # Finality latencies and propagation delays in window.
+        self.latency_total = 0
+        self.delay_total = 0
+
+        self.time = 0
+
+    def emit(self, time, event, validator, data):
+
+        self.time = time
+        self.events.append((time, event, data.get('latency', 0), data.get('delay', 0)))
+        self.counts[event] += 1
+        self.latency_total += data.get('latency', 0)
+        self.delay_total += data.get('delay', 0)
+
+        # Drop events before window.
+        while self.events[0][0] <= time - self.window:
+            _, old_event, old_latency, old_delay = self.events.popleft()
+            self.counts[old_event] -= 1
+            self.latency_total -= old_latency
+            self.delay_total -= old_delay
+
+    def rate(self, event):
+        '''
+        Function returns occurrences of an event
+        per unit of time in the window.
+        '''
+        return self.counts[event] / self.window
+
+    def finality_latency(self):
+        '''
+        Function returns the average time from proposal
+        to finalisation of checkpoints finalised in the window.
+        '''
+        if not self.counts['finalise']:
+            return None
+        return self.latency_total / self.counts['finalise']
+
+    def propagation_delay(self):
+        '''
+        Function returns the average time from first sending to
+        first receipt of gossiped messages received in the window.
+        '''
+        if not self.counts['propagate']:
+            return None
+        return self.delay_total / self.counts['propagate']
+
+
+def create_sink(filename):
+    '''
+    Function creates a file sink from the filename's extension.
+    '''
+    if filename.endswith('.parquet'):
+        return ParquetSink(filename)
+    return CSVSink(filename)
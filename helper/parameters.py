@@ -27,18 +27,76 @@ INITIAL_DEPOSIT = 100
 SLASH = 0.01
 REWARD = 0.05
 
+# Validators sampled by deposit into each checkpoint epoch's committee,
+# whose votes count towards justification, 0 for every validator.
+COMMITTEE_SIZE = 0
+
+# Validators aggregating each checkpoint epoch's votes, votes are sent only to
+# them and they broadcast aggregates per link, 0 to broadcast every vote.
+AGGREGATORS = 0
+
+# Time an aggregator collects votes for a link before sending an aggregate.
+AGGREGATION_WINDOW = 5
+
+# Maximum number of messages a validator buffers while waiting on missing blocks.
+BUFFER_CAP = 10000
+
+# Buffer eviction policy, 'oldest' first or by 'height' below the head then oldest.
+BUFFER_EVICTION = 'oldest'
+
+# Checkpoints below the head kept in the buffer under the 'height' policy.
+BUFFER_HEIGHT_WINDOW = 10
+
+
+########## Topology Parameters ##########
+
+# Number of regions, validators are placed in region id % REGIONS.
+REGIONS = 1
+
+# Mean latency between each pair of regions, as a REGIONS x REGIONS
+# list of lists, None for the network's average latency everywhere.
+REGION_LATENCY = None
+
+# Fixed delay between each pair of regions, None for no delay.
+REGION_DELAY = None
+
+# Messages a validator sends per unit of time, 0 for no limit.
+BANDWIDTH = 0
+
+# Peers each validator relays a newly received message to, 0 to
+# broadcast messages directly to every validator. Missing blocks
+# are requested from the peer that sent the message waiting on them.
+GOSSIP_FANOUT = 0
+
+# Windows (start, end, groups) of logical time during which regions in different
+# groups are disconnected, e.g. (100, 500, [[0], [1, 2]]). Messages across the
+# partition are held until it heals, regions in no group reach every group.
+NETWORK_PARTITIONS = []
+
 
 ########## Simulation Parameters ##########
 
 # Directory to draw simulation blockchains.
 SIMULATION_FOLDER = 'simulation_blockchains'
 
+# Plot blockchains and graphs, plotting libraries are only loaded when enabled.
+PLOT = True
+
 # Plot simulations blockchains progressively.
 PROGRESSIVE_PLOT = False
 
+# Number of processes rendering plots while the simulation continues, 0 renders in the simulation.
+PLOT_WORKERS = 2
+
 # Fraction of simulation validators that are Byzantine.
 FRAC_BYZ = 0
 
+# Seed for simulation randomness, fault test samples derive their seeds from it.
+SEED = 0
+
+# Jump between logical times with events instead of ticking every unit of time.
+EVENT_DRIVEN = True
+
 
 ########## Fault Test Parameters ##########
 
@@ -48,6 +106,15 @@ FAULT_FOLDER = 'fault_graphs'
 # Sample size for fault testing.
 SAMPLE_SIZE = 10
 
+# Number of processes to run samples in.
+WORKERS = 1
+
+# Directory to cache sample results in.
+CACHE_FOLDER = 'fault_cache'
+
+# Maximum size in bytes of cached sample results.
+CACHE_SIZE = 256 * 2**20
+
 # Latency values for latency test.
 LATENCIES = [i for i in range(25)]
 
@@ -0,0 +1,151 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+
+Opt-in timing of simulation handlers. Handlers are wrapped
+only while instrumented, so there is no cost otherwise.
+'''
+
+import sys, time, cProfile, pstats
+from collections import defaultdict
+
+
+# Handlers timed on each validator and on the network.
+VALIDATOR_HANDLERS = ['accept_block', 'check_vote', 'check_aggregate', 'fix_head']
+NETWORK_HANDLERS = ['broadcast', 'apply_deposits']
+
+
+class Profiler():
+    '''
+    Class counts calls and accumulates time spent
+    in the handlers of a network and its validators.
+    '''
+
+    def __init__(self):
+
+        # Calls and total seconds for each handler.
+        self.stats = defaultdict(lambda: [0, 0.0])
+
+        # Objects, attributes, the wrappers replacing them
+        # and any wrapper they replaced.
+        self.wrapped = []
+
+        self.profile = None
+
+    def wrap(self, obj, method, name_of):
+        '''
+        Function replaces a method of an object with a wrapper
+        timing it under the name given for its arguments.
+        '''
+
+        original = getattr(obj, method)
+        stats = self.stats
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                entry = stats[name_of(args)]
+                entry[0] += 1
+                entry[1] += time.perf_counter() - start
+
+        self.wrapped.append((obj, method, wrapper, vars(obj).get(method)))
+        setattr(obj, method, wrapper)
+
+    def instrument(self, network):
+        '''
+        Function times the handlers of the network and its
+        validators, deliveries are timed per message type.
+        '''
+
+        for method in NETWORK_HANDLERS:
+            self.wrap(network, method, lambda args, m=method: m)
+
+        for validator in network.validators:
+
+            self.wrap(validator, 'deliver', lambda args: f"deliver[{type(args[0]).__name__}]")
+
+            for method in VALIDATOR_HANDLERS:
+                self.wrap(validator, method, lambda args, m=method: m)
+
+    def profile_validator(self, validator):
+        '''
+        Function samples deliveries and proposals of one
+        validator with cProfile.
+        '''
+
+        self.profile = cProfile.Profile()
+
+        for method in ['deliver', 'execute']:
+            self.wrap_profile(validator, method)
+
+    def wrap_profile(self, obj, method):
+
+        original = getattr(obj, method)
+        profile = self.profile
+        depth = [0]
+
+        def wrapper(*args, **kwargs):
+
+            # Enable only for outermost calls.
+            if depth[0]:
+                return original(*args, **kwargs)
+
+            depth[0] += 1
+            profile.enable()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profile.disable()
+                depth[0] -= 1
+
+        self.wrapped.append((obj, method, wrapper, vars(obj).get(method)))
+        setattr(obj, method, wrapper)
+
+    def suspend(self):
+        '''
+        Function restores the original methods until resumed,
+        for example to snapshot the network.
+        '''
+        for obj, method, _, previous in reversed(self.wrapped):
+            if previous is None:
+                delattr(obj, method)
+            else:
+                setattr(obj, method, previous)
+
+    def resume(self):
+        for obj, method, wrapper, _ in self.wrapped:
+            setattr(obj, method, wrapper)
+
+    def uninstrument(self):
+        '''
+        Function restores the original methods.
+        '''
+        self.suspend()
+        self.wrapped = []
+
+    def summary(self):
+        '''
+        Function formats calls and inclusive time per handler.
+        '''
+
+        lines = [f"{'handler':<24}{'calls':>10}{'seconds':>12}{'us/call':>10}"]
+
+        for name, (calls, seconds) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<24}{calls:>10}{seconds:>12.4f}{1e6 * seconds / calls:>10.2f}")
+
+        return '\n'.join(lines)
+
+    def dump(self, file=sys.stdout, limit=20):
+        '''
+        Function writes the summary, and the sampled
+        validator's profile if any.
+        '''
+
+        print(self.summary(), file=file)
+
+        if self.profile is not None:
+            print(file=file)
+            pstats.Stats(self.profile, stream=file).sort_stats('cumulative').print_stats(limit)
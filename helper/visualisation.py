@@ -7,14 +7,20 @@ Helper functions to plot blockchains and graphs.
 '''
 
 import random, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 import networkx as nx
-import pygraphviz
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from casper.block import Block
-from helper.parameters import *
+from helper.metrics import MetricsSink
+
+
+# Colours of checkpoints in plotted blockchains.
+FINALISED = '#00B300'
+JUSTIFIED = '#FFA500'
+UNJUSTIFIED = 'r'
 
 
 def create_blockchain(node):
@@ -22,89 +28,214 @@ def create_blockchain(node):
     blockchain = nx.DiGraph()
 
     # Look at received blocks.
-    for block_hash in node.received:
-
-        if isinstance(node.received[block_hash], Block):
-            
-            block = node.received[block_hash]
+    for block in node.received_blocks():
             
-            # Assert block is a checkpoint.
-            if block.is_checkpoint:
+        # Assert block is a checkpoint.
+        if block.is_checkpoint:
 
-                blockchain.add_node(block_hash)
+            blockchain.add_node(block.hash)
 
-                # Assert not genesis
-                if block.height > 0:
+            # Assert not genesis
+            if block.height > 0:
 
-                    prev_checkpoint = node.get_checkpoint_parent(block)
-                    prev_checkpoint_hash = prev_checkpoint.hash
+                prev_checkpoint = node.get_checkpoint_parent(block)
+                prev_checkpoint_hash = prev_checkpoint.hash
 
-                    # Add edge from parent.
-                    blockchain.add_edge(block_hash, prev_checkpoint_hash)
+                # Add edge from parent.
+                blockchain.add_edge(block.hash, prev_checkpoint_hash)
 
 
     return blockchain
 
 
-def plot_node_blockchains(validators, image_file):
+class BlockchainSink(MetricsSink):
+    '''
+    Sink maintaining the checkpoint tree of each validator from
+    checkpoint, justify and finalise events, so progressive plots
+    only add new checkpoints instead of rescanning received blocks.
+    Checkpoints are placed once, when first received by any
+    validator, and keep their position in every later frame.
+    '''
 
-    # Gather blockchains from validators.
-    blockchains = [create_blockchain(i) for i in validators]
+    def __init__(self, validators):
 
-    # Set figure size.
-    plt.figure(figsize=(40, 20))
+        # Checkpoint trees by validator id, with edges to parents.
+        self.blockchains = {}
+
+        # Colours of checkpoints by validator id and hash.
+        self.colours = {}
+
+        # Positions of checkpoints, shared by all validators' trees.
+        self.positions = {}
+
+        # Checkpoints with a placed child, and the next free column.
+        self.branched = set()
+        self.columns = 0
+
+        # Start from the validators' current state, for resumed simulations.
+        for validator in validators:
+
+            blockchain = create_blockchain(validator)
+
+            self.blockchains[validator.id] = blockchain
+            self.colours[validator.id] = {block_hash: checkpoint_colour(validator, block_hash)
+                                          for block_hash in blockchain}
+
+            # Place parents before their children.
+            for block_hash in reversed(list(nx.topological_sort(blockchain))):
+                parents = list(blockchain.successors(block_hash))
+                self.place(block_hash, parents[0] if parents else None)
+
+    def emit(self, time, event, validator, data):
+
+        if validator not in self.blockchains:
+            return
+
+        colours = self.colours[validator]
+
+        if event == 'checkpoint':
+
+            blockchain = self.blockchains[validator]
+            blockchain.add_node(data['hash'])
+            blockchain.add_edge(data['hash'], data['parent'])
+            self.place(data['hash'], data['parent'])
+
+            # May have been justified before being received.
+            colours.setdefault(data['hash'], UNJUSTIFIED)
+
+        elif event == 'justify' and colours.get(data['hash']) != FINALISED:
+            colours[data['hash']] = JUSTIFIED
+
+        elif event == 'finalise':
+            colours[data['hash']] = FINALISED
+
+    def place(self, block_hash, parent=None):
+        '''
+        Function places a new checkpoint above its parent, in the
+        parent's column for its first child and a new column for
+        each fork, so only new checkpoints are laid out.
+        '''
+
+        if block_hash in self.positions:
+            return
+
+        if parent in self.positions and parent not in self.branched:
+            x, y = self.positions[parent]
+            self.branched.add(parent)
+
+        else:
+            x, y = self.columns, -1
+            if parent in self.positions:
+                y = self.positions[parent][1]
+                self.branched.add(parent)
+            self.columns += 1
+
+        self.positions[block_hash] = (x, y + 1)
 
-    count = 0
+    def frame(self, validators):
+        '''
+        Function returns a copy of the validators' trees to draw, as
+        (validator id, checkpoints, edges, colours) of each validator.
+        '''
 
-    labels = {}
-    for validator, blockchain in zip(validators, blockchains):
- 
-        # Create list of committable validators
-        colour_list = []
+        frame = []
+        for validator in validators:
 
-        pos = {}
-        label_set = set()
-        for block_hash in list(blockchain.nodes()):
+            blockchain = self.blockchains[validator.id]
+            colours = self.colours[validator.id]
 
-            block = validator.received[block_hash]
+            frame.append((validator.id, list(blockchain), list(blockchain.edges),
+                          [colours[block_hash] for block_hash in blockchain]))
 
-            # label_set.add(block_hash)
-            # if block_hash not in labels:
-            #     x = len(labels)
-            #     labels[block_hash] = x
+        return frame
 
-            if block_hash not in validator.received:
-                print("HERE")
 
-            if validator.is_finalised(block_hash):
-                color = '#00B300'
-            elif validator.is_justified(block_hash):
-                color = '#FFA500'
-            else:
-                color = 'r'
-            colour_list.append(color)
+def checkpoint_colour(validator, block_hash):
 
-        # labels = {j:i for i,j in enumerate(list(label_set))}
+    if validator.is_finalised(block_hash):
+        return FINALISED
+    elif validator.is_justified(block_hash):
+        return JUSTIFIED
+    return UNJUSTIFIED
+
+
+def render_frame(frame, image_file, positions):
+    '''
+    Function draws a frame of checkpoint trees, with the
+    positions of checkpoints maintained by a BlockchainSink.
+    '''
+
+    # Set figure size.
+    plt.figure(figsize=(40, 20))
+
+    for count, (validator_id, checkpoints, edges, colours) in enumerate(frame):
 
         # Create subplot
-        ax = plt.subplot(1, len(blockchains), count + 1)
-        ax.set_title(f"Validator {validator.id + 1}", fontsize=30)
+        ax = plt.subplot(1, len(frame), count + 1)
+        ax.set_title(f"Validator {validator_id + 1}", fontsize=30)
 
-        # Create graph.
-        pos = nx.drawing.nx_agraph.pygraphviz_layout(blockchain, prog='dot')
-        
-        # Draw.
-        blockchain = nx.DiGraph.reverse(blockchain)
-        # nx.draw(blockchain, arrows=True, pos=pos, node_color=colour_list, labels=labels, width = 1, style='dashed', node_shape='s')
-        nx.draw(blockchain, arrows=True, pos=pos, node_color=colour_list, width = 1, style='dashed', node_shape='s')
+        # Draw with edges from parents.
+        blockchain = nx.DiGraph()
+        blockchain.add_nodes_from(checkpoints)
+        blockchain.add_edges_from((parent, child) for child, parent in edges)
 
-        count += 1
+        nx.draw(blockchain, arrows=True, pos=positions, node_color=colours, width = 1, style='dashed', node_shape='s')
 
     plt.savefig(image_file)
     plt.close()
 
 
-def plot_line_graphs(df, title, xlabel, ylabel, filename):
+def plot_node_blockchains(validators, image_file, sink=None):
+    '''
+    Function plots the checkpoint tree of each validator, from
+    the trees maintained by a BlockchainSink if given.
+    '''
+
+    if sink is None:
+        sink = BlockchainSink(validators)
+
+    render_frame(sink.frame(validators), image_file, sink.positions)
+
+
+class FrameWriter():
+    '''
+    Class renders frames in a pool of worker processes, so the
+    simulation continues while frames are drawn and saved.
+    '''
+
+    def __init__(self, workers):
+
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+        # Frames submitted and not yet collected, oldest first.
+        self.pending = deque()
+        self.max_pending = 2 * workers
+
+    def write(self, sink, validators, image_file):
+        '''
+        Function submits the validators' current trees to be
+        rendered to image_file.
+        '''
+
+        # Collect rendered frames, waiting if too many are queued.
+        while self.pending and (self.pending[0].done() or len(self.pending) >= self.max_pending):
+            self.pending.popleft().result()
+
+        self.pending.append(self.executor.submit(render_frame, sink.frame(validators), image_file,
+                                                  dict(sink.positions)))
+
+    def close(self):
+        '''
+        Function waits for submitted frames to be saved.
+        '''
+
+        while self.pending:
+            self.pending.popleft().result()
+
+        self.executor.shutdown()
+
+
+def plot_line_graphs(df, title, xlabel, ylabel, filename, folder):
     '''
     Function plots results of tests.
     '''
@@ -117,5 +248,5 @@ def plot_line_graphs(df, title, xlabel, ylabel, filename):
     plt.ylabel(ylabel, fontsize=15)
     plt.title(title, fontsize=25)
     plt.ylim(0,1)
-    filename = os.path.join(FAULT_FOLDER, f"{filename}.png")   
+    filename = os.path.join(folder, f"{filename}.png")   
     fig.savefig(filename)
\ No newline at end of file
@@ -4,54 +4,215 @@ Marco Marasco 834482
 Austen McClernon 834063
 '''
 
-import os, math
+import os, math, argparse
 from casper.network import Network
 from casper.caspervalidator import CasperValidator
-from helper.visualisation import plot_node_blockchains
-from helper.parameters import *
+from helper.metrics import CounterSink, create_sink
+from helper.profiling import Profiler
+from helper.config import SimConfig
 
 
+def plot_blockchains(validators, time, blockchains=None, writer=None):
+    '''
+    Function plots the chains of validators at a logical time,
+    importing the plotting libraries on first use. Frames are
+    rendered in the background if given a FrameWriter.
+    '''
+
+    config = validators[0].config
+
+    if not config.plot:
+        return
+
+    from helper.visualisation import plot_node_blockchains
+
+    # Create filename with logical time value.
+    filename = os.path.join(config.simulation_folder, f"blockchain_{time}.png")
+
+    if writer is not None:
+        writer.write(blockchains, validators, filename)
+    else:
+        plot_node_blockchains(validators, filename, blockchains)
+
+
+def simulate(network, validators, end_time, blockchains=None, writer=None):
+    '''
+    Function runs the network from its current time up to
+    end_time, plotting chains at checkpoints if progressive.
+    '''
+
+    config = network.config
+
+    checkpoint_time = config.block_frequency * config.checkpoint_diff
+
+    # Run simulation
+    if config.event_driven and not (config.plot and config.progressive_plot):
+
+        network.run(end_time)
+
+    elif config.event_driven:
+
+        # Run up to and including each checkpoint time.
+        first = -(-network.time // checkpoint_time) * checkpoint_time
+        for time in range(first, end_time, checkpoint_time):
+
+            network.run(time + 1)
+
+            plot_blockchains(validators, time, blockchains, writer)
+
+        network.run(end_time)
+
+    else:
+
+        for time in range(network.time, end_time):
+
+            network.execute()
+
+            # New checkpoint.
+            if config.progressive_plot and  (not (time % checkpoint_time) ):
+                
+                plot_blockchains(validators, time, blockchains, writer)
+
 
 def main():
     '''
     Function simulates blockchain environment with parameters
-    set in parameters.py, creates a greaph of chains generated
-    in /SIMULATION_FOLDER.
+    set in parameters.py, or overridden with --config and --set,
+    creates a greaph of chains generated in /SIMULATION_FOLDER.
     '''    
-    
-    if not os.path.exists(SIMULATION_FOLDER):
-        os.makedirs(SIMULATION_FOLDER)
 
-    # Create simulated network.
-    network = Network(AVG_LATENCY)
+    parser = argparse.ArgumentParser(description="Simulate a blockchain running Casper.")
+    parser.add_argument('--resume', metavar='FILE',
+                        help="Resume the simulation from a snapshot.")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help="Save a snapshot of the simulation.")
+    parser.add_argument('--snapshot-at', type=int, metavar='TIME',
+                        help="Logical time to save the snapshot at, defaults to the end.")
+    parser.add_argument('--latency', type=float,
+                        help="Average latency to continue a resumed simulation with.")
+    parser.add_argument('--seed', type=int,
+                        help="Seed to continue a resumed simulation with.")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Write events as they occur to a CSV or Parquet file.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time handlers and print a summary at the end of the run.")
+    parser.add_argument('--profile-validator', type=int, metavar='ID',
+                        help="Sample a validator with cProfile, implies --profile.")
+    parser.add_argument('--no-plot', action='store_true',
+                        help="Only print event counts, without loading plotting libraries.")
+    SimConfig.add_arguments(parser)
+    args = parser.parse_args()
 
-    # Create simulated validators.
-    validators = [CasperValidator(network, i) for i in list(range(VALIDATORS))]
+    config = SimConfig.from_args(args)
 
+    if args.no_plot:
+        config.plot = False
 
-    if FRAC_BYZ != 0:
-        for j in range(math.ceil(VALIDATORS/FRAC_BYZ)):
-            validators[j].byzantine = True
+    if args.resume:
 
+        # Continue simulated network, optionally as a different scenario.
+        network = Network.load(args.resume)
+        validators = network.validators
 
-    # Run simulation
-    for time in range(BLOCK_FREQUENCY * CHECKPOINT_DIFF * CHECKPOINTS):
+        # Parameters of the simulated network carry over, overrides
+        # only apply to the length of the run and how it is reported.
+        network.config.update(checkpoints=config.checkpoints,
+                              simulation_folder=config.simulation_folder,
+                              plot=config.plot,
+                              progressive_plot=config.progressive_plot,
+                              event_driven=config.event_driven)
+
+        if args.latency is not None:
+            network.latency = args.latency
+
+        if args.seed is not None:
+            network.reseed(args.seed)
 
-        network.execute()
+    else:
 
-        # New checkpoint.
-        if PROGRESSIVE_PLOT and  (not (time % (BLOCK_FREQUENCY * CHECKPOINT_DIFF)) ):
-            
-            # Create filename with logical time value.
-            filename = os.path.join(SIMULATION_FOLDER, f"blockchain_{time}.png")
-            
-            plot_node_blockchains(validators, filename)
+        # Create simulated network.
+        network = Network(config.avg_latency, config.seed, config)
+
+        # Create simulated validators.
+        validators = [CasperValidator(network, i) for i in config.validator_set]
+
+
+        if config.frac_byz != 0:
+            for j in range(math.ceil(config.validators/config.frac_byz)):
+                validators[j].byzantine = True
+
+    config = network.config
+
+    if config.plot and not os.path.exists(config.simulation_folder):
+        os.makedirs(config.simulation_folder)
+
+
+    # Count events, and record them if requested.
+    counter = CounterSink()
+    network.add_sink(counter)
+
+    if args.metrics:
+        network.add_sink(create_sink(args.metrics))
+
+    blockchains = None
+    writer = None
+
+    # Maintain checkpoint trees as the simulation runs.
+    if config.plot:
+
+        from helper.visualisation import BlockchainSink, FrameWriter
+
+        blockchains = BlockchainSink(validators)
+        network.add_sink(blockchains)
+
+        if config.plot_workers > 0:
+            writer = FrameWriter(config.plot_workers)
+
+    profiler = None
+
+    if args.profile or args.profile_validator is not None:
+
+        profiler = Profiler()
+        profiler.instrument(network)
+
+        if args.profile_validator is not None:
+            profiler.profile_validator(validators[args.profile_validator])
+
+    end_time = config.end_time
+
+    if args.snapshot and args.snapshot_at is not None:
+
+        simulate(network, validators, args.snapshot_at, blockchains, writer)
+
+        # Wrappers are not part of a snapshot.
+        if profiler is not None:
+            profiler.suspend()
+
+        network.save(args.snapshot)
+
+        if profiler is not None:
+            profiler.resume()
+
+    simulate(network, validators, end_time, blockchains, writer)
+
+    if profiler is not None:
+        profiler.uninstrument()
+        profiler.dump()
+
+    if args.snapshot and args.snapshot_at is None:
+        network.save(args.snapshot)
+
+    network.close_sinks()
+
+    for event, count in sorted(counter.counts.items()):
+        print(f"{event}: {count}")
 
     # Save final blockchain.
-    filename = os.path.join(SIMULATION_FOLDER, f"blockchain_{time}.png")    
-    plot_node_blockchains(validators, filename)
+    plot_blockchains(validators, end_time - 1, blockchains, writer)
+
+    if writer is not None:
+        writer.close()
 
 
 if __name__ == '__main__':
     main()
-    
\ No newline at end of file
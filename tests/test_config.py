@@ -0,0 +1,35 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+from helper.config import SimConfig
+
+
+def test_defaults_not_shared():
+    '''
+    Function checks editing a config in place
+    leaves the defaults of later configs intact.
+    '''
+
+    config = SimConfig()
+    default = list(config.latencies)
+
+    config.latencies.append(-1)
+
+    assert SimConfig().latencies == default
+
+
+def test_copy_not_shared():
+    '''
+    Function checks a copied config does not share
+    lists with the config it was copied from.
+    '''
+
+    config = SimConfig()
+    copied = config.copy()
+
+    copied.latencies.append(-1)
+
+    assert config.latencies != copied.latencies
@@ -0,0 +1,60 @@
+'''
+COMP90020 Term Report
+Marco Marasco 834482
+Austen McClernon 834063
+'''
+
+from casper.network import VoteMessage, AggregateVote
+from casper.tally import LinkTally
+
+
+def test_justify_pruned_link():
+    '''
+    Function checks a link below the pruned height, whose
+    voters have no pending links, can be justified.
+    '''
+
+    tally = LinkTally()
+    tally.prune(2)
+
+    link = tally.add(VoteMessage(0, 1, 0, 1, 0, 100), 100)
+    tally.justify(link)
+
+    assert link.justified
+    assert not tally.pending
+
+
+def test_prune_stops_following_deposits():
+    '''
+    Function checks pruned links are not updated
+    by later changes in deposits.
+    '''
+
+    tally = LinkTally()
+
+    low = tally.add(VoteMessage(0, 1, 0, 1, 0, 100), 100)
+    high = tally.add(VoteMessage(0, 3, 0, 3, 0, 100), 100)
+    tally.prune(2)
+
+    assert tally.update_deposit(0, 10) == [high]
+    assert (low.stake, high.stake) == (100, 110)
+
+
+def test_aggregate_returns_new_voters():
+    '''
+    Function checks an aggregate returns only the
+    validators it newly counted, in order of id.
+    '''
+
+    class Validator():
+        deposit = 100
+
+    validators = [Validator()] * 4
+
+    tally = LinkTally()
+    tally.add(VoteMessage(0, 1, 0, 1, 1, 100), 100)
+
+    link, voters = tally.add_aggregate(AggregateVote(0, 1, 0, 1, 0, {3: 100, 1: 100, 0: 100}), validators)
+
+    assert voters == [0, 3]
+    assert link.stake == 300